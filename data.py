@@ -15,18 +15,52 @@ Where necessary, API keys are taken from the config module.
 import time
 import datetime
 import urllib.request
+import urllib.parse
 import json
 import csv
+import codecs
+import io
 import base64
 import os
+import re
+import concurrent.futures
+import functools
+import itertools
+import math
 
 import numpy as np
+try:
+	# (orjson parses considerably faster, but is an optional dependency)
+	from orjson import loads as _json_loads
+except ImportError:
+	_json_loads = json.loads
 
 import config
 import misc
 
 
 
+def update_all(wait=True):
+	"""
+	Fetch and store the latest data from all of the APIs used by this module
+	(other than the consumption data used by get_actual_spend()).
+
+	The updates run concurrently, since they consist almost entirely of
+	waiting for network responses. The wait argument is passed on to
+	update_agile_prices(). Any exception raised by one of the updates is
+	re-raised once all of them have finished.
+	"""
+	with concurrent.futures.ThreadPoolExecutor(4) as executor:
+		futures = [
+			executor.submit(update_agile_prices, wait),
+			executor.submit(update_temperature_forecast),
+			executor.submit(update_nat_grid_demand_forecast),
+			executor.submit(update_nat_grid_wind_forecast),
+		]
+	for future in futures:
+		future.result()
+
+
 def get_hourly_temperatures(start_time):
 	"""
 	Return hourly forecast temperatures at the location defined in config.
@@ -39,27 +73,23 @@ def get_hourly_temperatures(start_time):
 	"""
 	start_time = start_time.astimezone(datetime.timezone.utc)
 	# Get the data from the csv
-	data_dict = load_csv_time_series(
+	times, temps = load_csv_time_series_arrays(
 		os.path.join(config.DATA_DIRECTORY, config.TEMPERATURE_FILE),
 		"Time",
 		"Temperature (\N{DEGREE SIGN}C)",
 		config.FILE_DATETIME_FORMAT
 	)
-	times, temps = zip(*sorted(
-		[(t, float(data_dict[t])) for t in data_dict],
-		key=lambda x: x[0]
-	))
-	if not (times[0] <= start_time <= times[-1]):
-		raise RuntimeError("insufficient data in csv file for temperature forecast")
 	# Convert into hours after start_time
-	times = [(t - start_time)/datetime.timedelta(hours=1) for t in times]
+	times = (times - start_time.timestamp()) / 3600
+	if len(times) == 0 or not (times[0] <= 0 <= times[-1]):
+		raise RuntimeError("insufficient data in csv file for temperature forecast")
 	# Linearly interpolate to get the approx temperatures at the desired hours
 	num_hours = int(times[-1])
-	return list(np.interp(
-		np.linspace(0, num_hours, num_hours+1),
+	return np.interp(
+		np.arange(num_hours+1),
 		times,
 		temps
-	))
+	).tolist()
 
 def update_temperature_forecast():
 	"""
@@ -69,48 +99,43 @@ def update_temperature_forecast():
 	a more up-to-date forecast).
 	"""
 	lat, long = config.LATITUDE, config.LONGITUDE
-	# Get hourly Met Office forecast.
-	request = urllib.request.Request(
-		"https://data.hub.api.metoffice.gov.uk/sitespecific/v0/point/hourly"
-			+ f"?includeLocationName=true&latitude={lat}&longitude={long}",
-		headers={
-			"apikey" : config.METOFFICE_API_KEY
-		}
-	)
-	with urllib.request.urlopen(request) as f:
-		response = json.loads(f.read())
-	times = [
-		_metoff_dt(d["time"])
-		for d in response["features"][0]["properties"]["timeSeries"]
-	]
-	temps = [
-		float(d["screenTemperature"])
-		for d in response["features"][0]["properties"]["timeSeries"]
+	# Get the hourly and 3-hourly Met Office forecasts (concurrently, since
+	# most of the time is spent waiting for the responses)
+	requests = [
+		urllib.request.Request(
+			"https://data.hub.api.metoffice.gov.uk/sitespecific/v0/point/"
+				+ f"{resolution}?includeLocationName=true"
+				+ f"&latitude={lat}&longitude={long}",
+			headers={
+				"apikey" : config.METOFFICE_API_KEY
+			}
+		)
+		for resolution in ["hourly", "three-hourly"]
 	]
-	last_hourly_entry = max(times)
-	# Get 3-hourly Met Office forecast and append it to the hourly forecast;
-	# this is less detailed but extends further into the future.
-	request = urllib.request.Request(
-		"https://data.hub.api.metoffice.gov.uk/sitespecific/v0/point/three-hourly"
-			+ f"?includeLocationName=true&latitude={lat}&longitude={long}",
-		headers={
-			"apikey" : config.METOFFICE_API_KEY
-		}
+	with concurrent.futures.ThreadPoolExecutor(len(requests)) as executor:
+		hourly, three_hourly = [
+			response["features"][0]["properties"]["timeSeries"]
+			for response in executor.map(_get_json, requests)
+		]
+	times = _parse_utc_times([d["time"] for d in hourly], _METOFF_DT_FORMAT)
+	temps = [float(d["screenTemperature"]) for d in hourly]
+	last_hourly_entry = np.max(times)
+	# Append the 3-hourly forecast to the hourly forecast; this is less
+	# detailed but extends further into the future.
+	three_hourly_times = _parse_utc_times(
+		[d["time"] for d in three_hourly], _METOFF_DT_FORMAT
 	)
-	with urllib.request.urlopen(request) as f:
-		response = json.loads(f.read())
-	times.extend([
-		_metoff_dt(d["time"])
-		for d in response["features"][0]["properties"]["timeSeries"]
-		if _metoff_dt(d["time"]) > last_hourly_entry
-	])
+	is_later = three_hourly_times > last_hourly_entry
+	times = np.concatenate([times, three_hourly_times[is_later]])
 	temps.extend([
 		0.5 * (float(d["maxScreenAirTemp"]) + float(d["minScreenAirTemp"]))
-		for d in response["features"][0]["properties"]["timeSeries"]
-		if _metoff_dt(d["time"]) > last_hourly_entry
+		for d, later in zip(three_hourly, is_later.tolist())
+		if later
 	])
 	# Add these values to the csv file
-	times = [t.strftime(config.FILE_DATETIME_FORMAT) for t in times]
+	times = [
+		t.strftime(config.FILE_DATETIME_FORMAT) for t in times.astype(object)
+	]
 	append_csv(
 		os.path.join(config.DATA_DIRECTORY, config.TEMPERATURE_FILE),
 		zip(times, temps),
@@ -119,12 +144,134 @@ def update_temperature_forecast():
 		True
 	)
 
-def _metoff_dt(str):
+def _get_json(request):
 	"""
-	Return a datetime.datetime corresponding to a string in the MetOffice format.
+	Return the decoded JSON response to request (a URL or urllib.request.Request).
 	"""
-	d = datetime.datetime.strptime(str, r"%Y-%m-%dT%H:%MZ")
-	return d.replace(tzinfo=datetime.timezone.utc)
+	with urllib.request.urlopen(request) as f:
+		return _json_loads(f.read())
+
+def _get_all_pages(url, headers=None):
+	"""
+	Yield the "results" list from each page of a paginated Octopus API
+	response in turn, starting at url.
+
+	If headers is specified, it should be a dictionary of headers to include
+	in each request.
+
+	Where the first response shows how many further pages there are (i.e. it
+	gives the total count and its "next" URL has a page parameter), those
+	pages are requested concurrently, up to _MAX_CONCURRENT_PAGES at a time.
+	Otherwise each "next" URL is followed in turn.
+	"""
+	get_page = functools.partial(_get_page, headers=headers)
+	response = get_page(url)
+	yield response["results"]
+	url = response["next"]
+	page_urls = _remaining_page_urls(response)
+	if len(page_urls) > 0:
+		with concurrent.futures.ThreadPoolExecutor(
+			min(len(page_urls), _MAX_CONCURRENT_PAGES)
+		) as executor:
+			for response in executor.map(get_page, page_urls):
+				yield response["results"]
+		# (in case more results were added after the first page was fetched)
+		url = response["next"]
+	while url is not None:
+		response = get_page(url)
+		url = response["next"]
+		yield response["results"]
+
+# The maximum number of pages which _get_all_pages() requests at once
+_MAX_CONCURRENT_PAGES = 4
+
+def _get_page(url, headers=None):
+	"""
+	Helper function for _get_all_pages(); return the decoded JSON response
+	from url, including headers if specified.
+	"""
+	if headers is not None:
+		return _get_json(urllib.request.Request(url, headers=headers))
+	return _get_json(url)
+
+def _remaining_page_urls(response):
+	"""
+	Helper function for _get_all_pages(); return a list of the URLs of all of
+	the pages following the decoded JSON response, or an empty list if these
+	can't be determined from the response alone.
+	"""
+	page_size = len(response["results"])
+	if response["next"] is None or page_size == 0 or "count" not in response:
+		return []
+	scheme, netloc, path, query, fragment = urllib.parse.urlsplit(response["next"])
+	query = urllib.parse.parse_qs(query, keep_blank_values=True)
+	if len(query.get("page", [])) != 1 or not query["page"][0].isdigit():
+		return []
+	num_pages = math.ceil(response["count"] / page_size)
+	page_urls = []
+	for page in range(int(query["page"][0]), num_pages + 1):
+		query["page"] = [str(page)]
+		page_urls.append(urllib.parse.urlunsplit((
+			scheme, netloc, path,
+			urllib.parse.urlencode(query, doseq=True, safe=":"),
+			fragment
+		)))
+	return page_urls
+
+@functools.cache
+def _octopus_auth_headers(api_key):
+	"""
+	Return a dictionary of the headers needed to authenticate with the Octopus
+	API using the given API key.
+
+	(Cached, so that this is only constructed once per key; the returned
+	dictionary should not be modified.)
+	"""
+	basic_auth_str = base64.b64encode((api_key + ":").encode()).decode()
+	return {"Authorization" : f"Basic {basic_auth_str}"}
+
+def _get_octopus_consumption(url, headers):
+	"""
+	Return a dictionary of consumption values from the Octopus consumption API,
+	keyed by the POSIX timestamp of the start of each settlement period.
+
+	Each page is reduced to the required values as soon as it is received, so
+	that the full responses don't all need to be held in memory at once.
+	"""
+	consumption = {}
+	for results in _get_all_pages(url, headers):
+		# (times include a UTC offset, so can't be parsed by numpy, but
+		# fromisoformat() is still much quicker than strptime())
+		consumption.update({
+			int(datetime.datetime.fromisoformat(
+				row["interval_start"].replace("Z", "+00:00")
+			).timestamp())
+			: row["consumption"]
+			for row in results
+		})
+	return consumption
+
+def _get_octopus_prices(url):
+	"""
+	Return a dictionary of prices (excluding VAT) from the Octopus unit rates
+	API, keyed by the POSIX timestamp of the start of each settlement period.
+
+	As for _get_octopus_consumption(), each page is processed as it arrives.
+	"""
+	prices = {}
+	for results in _get_all_pages(url):
+		times = _parse_utc_times(
+			[row["valid_from"] for row in results],
+			r"%Y-%m-%dT%H:%M:%SZ"
+		).astype(np.int64)
+		prices.update(zip(
+			times.tolist(),
+			[row["value_exc_vat"] for row in results]
+		))
+	return prices
+
+# The format of times in MetOffice API responses
+_METOFF_DT_FORMAT = r"%Y-%m-%dT%H:%MZ"
 
 
 def update_nat_grid_demand_forecast():
@@ -135,30 +282,24 @@ def update_nat_grid_demand_forecast():
 	demand over the course of each half-hour is crudely estimated by averaging
 	the demands at the two endpoints.
 	"""
-	csv_str = urllib.request.urlopen(
+	with urllib.request.urlopen(
 		"https://api.nationalgrideso.com/"
 		+ "dataset/633daec6-3e70-444a-88b0-c4cef9419d40/"
 		+ "resource/7c0411cd-2714-4bb5-a408-adb065edf34d/"
 		+ "download/ng-demand-14da-hh.csv"
-	).read()
-	rows = [row for row in csv.reader(csv_str.decode().split("\r\n"))]
-	rows = rows[1:] # (ignore header)
-	rows = [row for row in rows if len(row) != 0] # (remove blank lines)
+	) as response:
+		# (decode and parse the response line by line as it is received)
+		csv_reader = csv.reader(codecs.iterdecode(response, "utf-8"))
+		next(csv_reader, None) # (ignore header)
+		rows = [row for row in csv_reader if len(row) != 0] # (remove blank lines)
 	# Convert to correct formats for appending to the csv
+	times = _parse_utc_times([row[2] for row in rows], r"%Y-%m-%dT%H:%M:%S")
+	assert np.all(np.diff(times) == np.timedelta64(30, "m"))
+	demands = np.array([row[3] for row in rows], dtype=np.float64)
+	demands = (0.5 * (demands[:-1] + demands[1:])) / 1000 # (convert to GW)
 	rows = [
-		(
-			datetime.datetime.strptime(row_1[2], r"%Y-%m-%dT%H:%M:%S"),
-			((float(row_1[3]) + float(row_2[3])) / 2)
-		)
-		for (row_1, row_2) in zip(rows, rows[1:])
-	]
-	assert all(
-		(r_2[0] - r_1[0] == datetime.timedelta(hours=0.5))
-		for (r_1, r_2) in zip(rows, rows[1:])
-	)
-	rows = [
-		(t.strftime(config.FILE_DATETIME_FORMAT), d / 1000) # (convert to GW)
-		for t, d in rows
+		(t.strftime(config.FILE_DATETIME_FORMAT), d)
+		for (t, d) in zip(times[:-1].astype(object), demands.tolist())
 	]
 	# Append this data to the csv
 	append_csv(
@@ -173,30 +314,24 @@ def update_nat_grid_wind_forecast():
 	"""
 	Fetch and store the national grid's 14 days ahead half-hourly wind forecast.
 	"""
-	csv_str = urllib.request.urlopen(
+	with urllib.request.urlopen(
 		"https://api.nationalgrideso.com/"
 		+ "dataset/2f134a4e-92e5-43b8-96c3-0dd7d92fcc52/"
 		+ "resource/93c3048e-1dab-4057-a2a9-417540583929/"
 		+ "download/14dawindforecast.csv"
-	).read()
-	rows = [row for row in csv.reader(csv_str.decode().split("\r\n"))]
-	rows = rows[1:] # (ignore header)
-	rows = [row for row in rows if len(row) != 0] # (remove blank lines)
+	) as response:
+		# (decode and parse the response line by line as it is received)
+		csv_reader = csv.reader(codecs.iterdecode(response, "utf-8"))
+		next(csv_reader, None) # (ignore header)
+		rows = [row for row in csv_reader if len(row) != 0] # (remove blank lines)
 	# Convert to correct formats for appending to the csv
+	times = _parse_utc_times([row[0] for row in rows], r"%Y-%m-%dT%H:%M:%SZ")
+	assert np.all(np.diff(times) == np.timedelta64(30, "m"))
+	wind_gen = np.array([row[4] for row in rows], dtype=np.float64)
+	wind_gen = wind_gen / 1000 # (convert to GW)
 	rows = [
-		(
-			datetime.datetime.strptime(row[0], r"%Y-%m-%dT%H:%M:%SZ"),
-			float(row[4])
-		)
-		for row in rows
-	]
-	assert all(
-		(r_2[0] - r_1[0] == datetime.timedelta(hours=0.5))
-		for (r_1, r_2) in zip(rows, rows[1:])
-	)
-	rows = [
-		(t.strftime(config.FILE_DATETIME_FORMAT), w / 1000) # (convert to GW)
-		for t, w in rows
+		(t.strftime(config.FILE_DATETIME_FORMAT), w)
+		for (t, w) in zip(times.astype(object), wind_gen.tolist())
 	]
 	# Append this data to the csv
 	append_csv(
@@ -217,21 +352,16 @@ def get_agile_prices():
 	length may be 0.
 	"""
 	# Get the data from the csv
-	data_dict = load_csv_time_series(
+	times, prices = load_csv_time_series_arrays(
 		os.path.join(config.DATA_DIRECTORY, config.PRICE_FILE),
 		"Start Time",
 		"Price (p/kWh)",
 		config.FILE_DATETIME_FORMAT
 	)
-	data = sorted(
-		[(t, float(data_dict[t])) for t in data_dict],
-		key=lambda x: x[0]
-	)
-	# Get and return just the prices from 23:00 tonight onwards
+	# Return just the prices from 23:00 tonight onwards
 	start_time = misc.midnight_tonight() - datetime.timedelta(hours=1)
-	data = [d for d in data if d[0] >= start_time]
-	# Return the prices
-	return [p for _, p in data]
+	i = np.searchsorted(times, start_time.timestamp())
+	return prices[i:].tolist()
 
 def update_agile_prices(wait=True):
 	"""
@@ -248,24 +378,20 @@ def update_agile_prices(wait=True):
 		+ f"{config.OCTOPUS_AGILE_REGION_CODE}/"
 		+ f"standard-unit-rates?period_from={period_from_str}"
 	)
-	response = json.loads(urllib.request.urlopen(api_request_url).read())
+	response = _get_json(api_request_url)
 	while wait and response["count"] == 0:
 		# Wait 10mins and try again
 		time.sleep(10 * 60)
-		response = json.loads(urllib.request.urlopen(api_request_url).read())
-	rows = [
-		(
-			datetime.datetime.strptime(
-				d["valid_from"], r"%Y-%m-%dT%H:%M:%SZ"
-			),
-			d["value_inc_vat"]
-		)
-		for d in response["results"]
-	]
-	rows.sort(key=lambda x: x[0])
+		response = _get_json(api_request_url)
+	times = _parse_utc_times(
+		[d["valid_from"] for d in response["results"]],
+		r"%Y-%m-%dT%H:%M:%SZ"
+	)
+	prices = [d["value_inc_vat"] for d in response["results"]]
+	order = np.argsort(times, kind="stable").tolist()
 	rows = [
-		(t.strftime(config.FILE_DATETIME_FORMAT), p)
-		for t, p in rows
+		(t.strftime(config.FILE_DATETIME_FORMAT), prices[i])
+		for t, i in zip(times[order].astype(object), order)
 	]
 	append_csv(
 		os.path.join(config.DATA_DIRECTORY, config.PRICE_FILE),
@@ -292,16 +418,21 @@ def get_actual_spend(start, end):
 	start = start.astimezone(UTC)
 	end = end.astimezone(UTC)
 	# Round start and end to the appropriate half-hours
-	start.replace(minute = start.minute - (start.minute % 30))
-	start.replace(second = 0, microsecond = 0)
+	start = start.replace(
+		minute = start.minute - (start.minute % 30),
+		second = 0,
+		microsecond = 0
+	)
 	if not(end.minute % 30 == 0 and end.second == end.microsecond == 0):
-		end.replace(minute = end.minute - (end.minute % 30))
-		end.replace(second = 0, microsecond = 0)
+		end = end.replace(
+			minute = end.minute - (end.minute % 30),
+			second = 0,
+			microsecond = 0
+		)
 		end += datetime.timedelta(minutes=30)
 	# Get consumption figures (consumption API uses closed time intervals)
 	last_settl_period = end - datetime.timedelta(minutes=30)
-	basic_auth_str = base64.b64encode((config.OCTOPUS_API_KEY + ':').encode()).decode()
-	url = (
+	consumption_url = (
 		"https://api.octopus.energy/v1/"
 		+ f"electricity-meter-points/{config.OCTOPUS_MPAN}/"
 		+ f"meters/{config.OCTOPUS_METER_SERIAL_NO}/"
@@ -309,23 +440,8 @@ def get_actual_spend(start, end):
 		+ f"&period_from={start.strftime(r'%Y-%m-%dT%H:%MZ')}"
 		+ f"&period_to={last_settl_period.strftime(r'%Y-%m-%dT%H:%MZ')}"
 	)
-	consumption = {}
-	while url is not None:
-		req = urllib.request.Request(
-			url,
-			headers={"Authorization" : f"Basic {basic_auth_str}"}
-		)
-		response = json.loads(urllib.request.urlopen(req).read())
-		consumption.update({
-			datetime.datetime.strptime(
-				row["interval_start"], r"%Y-%m-%dT%H:%M:%S%z"
-			).astimezone(UTC).strftime(r"%Y-%m-%dT%H:%M:%SZ")
-			: row["consumption"]
-			for row in response["results"]
-		})
-		url = response["next"]
 	# Get prices for the same period
-	url = (
+	prices_url = (
 		"https://api.octopus.energy/v1/products/"
 		+ f"{config.OCTOPUS_AGILE_PRODUCT_CODE}/electricity-tariffs/"
 		+ f"E-1R-{config.OCTOPUS_AGILE_PRODUCT_CODE}-"
@@ -333,20 +449,23 @@ def get_actual_spend(start, end):
 		+ f"?page_size=1500&period_from={start.strftime(r'%Y-%m-%dT%H:%MZ')}"
 		+ f"&period_to={end.strftime(r'%Y-%m-%dT%H:%MZ')}"
 	)
-	prices = {}
-	while url is not None:
-		response = json.loads(urllib.request.urlopen(url).read())
-		prices.update({
-			row["valid_from"] : row["value_exc_vat"]
-			for row in response["results"]
-		})
-		url = response["next"]
+	# (the two sets of pages are fetched concurrently)
+	with concurrent.futures.ThreadPoolExecutor(2) as executor:
+		consumption = executor.submit(
+			_get_octopus_consumption,
+			consumption_url,
+			_octopus_auth_headers(config.OCTOPUS_API_KEY)
+		)
+		prices = executor.submit(_get_octopus_prices, prices_url)
+		consumption, prices = consumption.result(), prices.result()
 	# Return total consumption and total cost
 	#
 	# For some reason Octopus rounds several times when calculating bills.
 	# Do all the rounding for each half-hour, but not for the overall total
 	# (since the time period probably represents only part of a bill)
 	assert set(consumption.keys()).issubset(prices.keys())
+	# (using the builtin round() rather than np.round(), which scales by 100
+	# before rounding and so gives different results for values such as 0.005)
 	total_consumption = total_cost = 0
 	for t in consumption:
 		total_consumption += consumption[t]
@@ -381,45 +500,97 @@ def append_csv(file_path, new_rows, field_names, unique_field=None, overwrite_du
 	specified, all new_rows will be appended.
 
 	If the file does not exist a new one will be created; if the file exists
-	but isn't a valid csv, an exception may be thrown.
+	but isn't a valid csv, an exception may be thrown. The existing contents of
+	the file are only rewritten if they need to change, otherwise the new rows
+	are simply appended. When rewritten, the file is atomically replaced by a
+	new one (written at file_path + ".tmp").
 	"""
-	# Convert each new_row to an appropriate dictionary
-	new_rows = [{k:v for k,v in zip(field_names, row)} for row in new_rows]
-	# Read any data already in the file
+	# Read any data already in the file (as lists rather than dictionaries,
+	# which avoids constructing a dict for every row)
 	try:
 		with open(file_path, "r", newline="", encoding="utf-8") as f:
-			csv_reader = csv.DictReader(f, delimiter=",")
-			prev_rows = [row for row in csv_reader]
-			prev_field_names = csv_reader.fieldnames
+			prev_contents = f.read()
 	except FileNotFoundError:
-		prev_rows = []
-		prev_field_names = []
+		prev_contents = ""
+	csv_reader = csv.reader(io.StringIO(prev_contents, newline=""), delimiter=",")
+	prev_field_names = next(csv_reader, [])
+	prev_rows = [row for row in csv_reader if len(row) != 0]
+	# Construct the full list of field names and map each new row onto it
+	new_field_names = [f for f in field_names if (f not in prev_field_names)]
+	all_field_names = prev_field_names + new_field_names
+	num_fields = len(all_field_names)
+	# (for each column of the file, the index of the corresponding value in
+	# each new row, or None if there isn't one)
+	new_row_indices = {f: i for i, f in enumerate(field_names)}
+	col_perm = [new_row_indices.get(f) for f in all_field_names]
+	if col_perm == list(range(num_fields)):
+		# (in the usual case the columns already match, so no remapping needed)
+		new_rows = [
+			list(row) if len(row) == num_fields
+			else _reorder_row(row, col_perm)
+			for row in new_rows
+		]
+	else:
+		new_rows = [_reorder_row(row, col_perm) for row in new_rows]
+	# The file only needs to be rewritten (rather than just appended to) if
+	# its header or any of the rows already in it need to be modified or
+	# removed, or if it doesn't end with a line break (which appended rows
+	# would otherwise be joined onto)
+	rewrite = (
+		len(prev_field_names) == 0
+		or len(new_field_names) != 0
+		or not prev_contents.endswith(("\n", "\r"))
+	)
+	# Pad or truncate any rows in the file which don't have the right number
+	# of cells (which will be all of them if new columns have been added)
+	if any(len(row) != num_fields for row in prev_rows):
+		prev_rows = [
+			(row + [""] * (num_fields - len(row)))[:num_fields]
+			for row in prev_rows
+		]
+		rewrite = True
 	# Remove any rows with duplicate values of unique_field
 	if unique_field is not None:
+		i = all_field_names.index(unique_field)
 		if overwrite_duplicates:
-			new_unique_values = set([row[unique_field] for row in new_rows])
-			prev_rows = [
-				row for row in prev_rows
-				if row[unique_field] not in new_unique_values
-			]
+			new_unique_values = {str(row[i]) for row in new_rows}
+			if any(row[i] in new_unique_values for row in prev_rows):
+				# (filtered lazily as the file is written, to avoid another copy)
+				prev_rows = (
+					row for row in prev_rows
+					if row[i] not in new_unique_values
+				)
+				rewrite = True
 		else:
-			unique_values_already_present = set([row[unique_field] for row in prev_rows])
+			unique_values_already_present = {row[i] for row in prev_rows}
 			new_rows = [
 				row for row in new_rows
-				if row[unique_field] not in unique_values_already_present
+				if str(row[i]) not in unique_values_already_present
 			]
-	# Construct the full list of rows with the appended data
-	new_field_names = [f for f in field_names if (f not in prev_field_names)]
-	all_field_names = prev_field_names + new_field_names
-	rows = [
-		{fn : (row[fn] if fn in row else "") for fn in all_field_names}
-		for row in (prev_rows + new_rows)
-	]
 	# Write the new data to the file
-	with open(file_path, "w", newline="", encoding="utf-8") as f:
-		csv_writer = csv.DictWriter(f, all_field_names, delimiter=",")
-		csv_writer.writeheader()
-		csv_writer.writerows(rows)
+	if rewrite:
+		# (to a temporary file which then replaces the original, so that the
+		# existing data isn't lost if writing fails part way through)
+		temp_file_path = file_path + ".tmp"
+		with open(temp_file_path, "w", newline="", encoding="utf-8") as f:
+			csv_writer = csv.writer(f, delimiter=",")
+			csv_writer.writerow(all_field_names)
+			csv_writer.writerows(itertools.chain(prev_rows, new_rows))
+		os.replace(temp_file_path, file_path)
+	else:
+		with open(file_path, "a", newline="", encoding="utf-8") as f:
+			csv_writer = csv.writer(f, delimiter=",")
+			csv_writer.writerows(new_rows)
+
+def _reorder_row(row, col_perm):
+	"""
+	Return row as a list of the same length as col_perm, the nth value of
+	which is row[col_perm[n]] (or blank if col_perm[n] is None or out of range).
+	"""
+	return [
+		row[i] if (i is not None and i < len(row)) else ""
+		for i in col_perm
+	]
 
 
 def load_csv_time_series(file_path, time_col, val_col, time_format=r"%Y-%m-%dT%H:%M:%SZ"):
@@ -435,13 +606,100 @@ def load_csv_time_series(file_path, time_col, val_col, time_format=r"%Y-%m-%dT%H
 	When there are multiple instances of the same time value in the file, the
 	returned dictionary will contain only one.
 	"""
-	time_series = {}
+	rows = _read_csv_columns(file_path, time_col, val_col)
+	times = _parse_utc_times([t for t, _ in rows], time_format).astype(object)
+	UTC = datetime.timezone.utc
+	return {t.replace(tzinfo=UTC) : v for t, (_, v) in zip(times, rows)}
+
+def load_csv_time_series_arrays(file_path, time_col, val_col, time_format=r"%Y-%m-%dT%H:%M:%SZ"):
+	"""
+	Return the time series data in the specified file as two numpy arrays.
+
+	The csv file should be as for load_csv_time_series(), except that the
+	values in the val_col column must be numeric.
+
+	Returns a tuple (times, values), where times is an int64 array of POSIX
+	timestamps (in seconds) in ascending order and values is a float64 array
+	of the corresponding values. When there are multiple instances of the same
+	time value in the file, only the last is included.
+
+	The result is cached until the file is next modified (or replaced), so
+	the returned arrays are read-only.
+	"""
+	# (the size and inode are included as well as the modification time, in
+	# case the file is modified more than once within the resolution of the
+	# latter; append_csv() always changes at least one of them)
+	stat = os.stat(file_path)
+	return _load_csv_time_series_arrays(
+		file_path,
+		(stat.st_mtime_ns, stat.st_size, stat.st_ino),
+		time_col,
+		val_col,
+		time_format
+	)
+
+@functools.lru_cache(maxsize=16)
+def _load_csv_time_series_arrays(file_path, file_version, time_col, val_col, time_format):
+	"""
+	Implements load_csv_time_series_arrays(), with the file's modification
+	time, size and inode as an additional argument so that it can be used as
+	a cache key.
+	"""
+	rows = _read_csv_columns(file_path, time_col, val_col)
+	times = _parse_utc_times([t for t, _ in rows], time_format).astype(np.int64)
+	values = np.array([v for _, v in rows], dtype=np.float64)
+	# Sort by time (stably, so that the last of any duplicates can be kept)
+	order = np.argsort(times, kind="stable")
+	times, values = times[order], values[order]
+	is_last = np.append(times[1:] != times[:-1], True)[:len(times)]
+	times, values = times[is_last], values[is_last]
+	times.setflags(write=False)
+	values.setflags(write=False)
+	return times, values
+
+def _read_csv_columns(file_path, time_col, val_col):
+	"""
+	Return a list of (time_col value, val_col value) tuples for each row of
+	the specified csv file.
+	"""
 	with open(file_path, "r", newline="", encoding="utf-8") as f:
-		csv_reader = csv.DictReader(f, delimiter=",")
-		for row in csv_reader:
-			t = datetime.datetime.strptime(
-				row[time_col], time_format
-			).replace(tzinfo=datetime.timezone.utc)
-			v = row[val_col]
-			time_series[t] = v
-	return time_series
+		csv_reader = csv.reader(f, delimiter=",")
+		header = next(csv_reader, [])
+		i_t, i_v = header.index(time_col), header.index(val_col)
+		return [(row[i_t], row[i_v]) for row in csv_reader if len(row) != 0]
+
+def _parse_utc_times(time_strs, time_format):
+	"""
+	Return the list of UTC time strings time_strs as a numpy datetime64 array.
+
+	Strings in one of the ISO 8601 formats in _ISO_8601_FORMATS are parsed by
+	numpy in a single call, which is much quicker than parsing them
+	individually; any other format (or any string which doesn't exactly match
+	the format, which numpy may be more lenient about) falls back to
+	datetime.datetime.strptime().
+	"""
+	pattern, length = _ISO_8601_FORMATS.get(time_format, (None, None))
+	if pattern is not None and all(pattern.fullmatch(s) for s in time_strs):
+		try:
+			return np.array([s[:length] for s in time_strs], dtype="datetime64[s]")
+		except ValueError:
+			pass
+	return np.array(
+		[datetime.datetime.strptime(s, time_format) for s in time_strs],
+		dtype="datetime64[s]"
+	)
+
+# Time formats which numpy can parse directly, mapped to a regular expression
+# matched by all strings in that format and the length of the part which
+# numpy should parse (i.e. without any suffix)
+_ISO_8601_FORMATS = {
+	r"%Y-%m-%dT%H:%M:%S" : (
+		re.compile(r"(?!0000)\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d", re.ASCII), 19
+	),
+	r"%Y-%m-%dT%H:%M:%SZ" : (
+		re.compile(r"(?!0000)\d{4}-\d\d-\d\dT\d\d:\d\d:\d\dZ", re.ASCII), 19
+	),
+	r"%Y-%m-%dT%H:%MZ" : (
+		re.compile(r"(?!0000)\d{4}-\d\d-\d\dT\d\d:\d\dZ", re.ASCII), 16
+	),
+}
@@ -48,6 +48,7 @@ C_q is the heat capacity of the slow-responding part.
 
 
 
+import functools
 import math
 import numpy as np
 
@@ -55,6 +56,17 @@ import config
 
 
 
+# Identifiers for the regimes in which Building._solve_eqns() can solve the
+# differential equations
+_FREE, _CHARGING, _DISCHARGING, _EQUALISED = range(4)
+
+# The indices of the sample points used for each simulation step (the arrays
+# returned by Building._simulation_step() will contain at least this many
+# values)
+_SAMPLE_INDICES = np.arange(100, dtype=float)
+
+
+
 def building_from_config():
 	"""
 	Return the Building defined by the config file.
@@ -108,8 +120,9 @@ class Building:
 	charging, and sh_max_temp, which gives the temperature to which the
 	thermostat will limit the internal temperature.
 	"""
-	# Private attribute _ode_matrices also provided, containing pre-diagonalised
-	# forms of the relevant differential equations
+	# Private attributes _M_free, _M_charging, _M_discharging and _M_equalised
+	# also provided, containing (lazily) diagonalised forms of the relevant
+	# differential equations
 
 	def __init__(self, k, h, j_passive, j_charging, C, C_sh, C_q, sh_charge_pwr, sh_max_temp):
 		self.k = k
@@ -121,40 +134,60 @@ class Building:
 		self.C_q = C_q
 		self.sh_charge_pwr = sh_charge_pwr
 		self.sh_max_temp = sh_max_temp
-		# To solve the equations, we will need diagonalised forms of the matrices
-		# relating the derivatives of the simulated temperatures (T,Q,S) to
-		# themselves (the inhomogeneous part is dealt with later). In other
-		# words, if the system of equations is written in vector form as
-		# dA/dt = MA + B + Ct, for vectors A,B,C, we calculate and diagonalise
-		# the matrix M. The rows of the vectors are ordered T, Q, S.
-		self._ode_matrices = {
-			# The free evolution of the system (i.e. the combination of eqs (1)
-			# (2) and (5)) when the storage heater is not charging (and hence
-			# there is no extra leakage).
-			"free" : DiagonalisedMatrix(np.array([
-				np.array([-k - h - j_passive, h,    j_passive ]) / C,
-				np.array([h,                 -h,    0         ]) / C_q,
-				np.array([j_passive,          0,    -j_passive]) / C_sh
-			])),
-			# When the storage heater is charging
-			"charging" : DiagonalisedMatrix(np.array([
-				np.array([-k - h - j_charging,  h,  j_charging]) / C,
-				np.array([h,                   -h,  0         ]) / C_q,
-				np.array([j_charging,           0, -j_charging]) / C_sh
-			])),
-			# Eqs (3) and (5) (and no change in T)
-			# Note that the T row is omitted
-			"discharging" : DiagonalisedMatrix(np.array([
-				np.array([-h, 0]) / C_q,
-				np.array([h,  0]) / C_sh
-			])),
-			# Eqs (4) and (5)
-			# Note that the T and S rows are combined
-			"equalised" : DiagonalisedMatrix(np.array([
-				np.array([-k - h,  h]) / (C_sh + C),
-				np.array([h,      -h]) / C_q
-			]))
-		}
+
+	# To solve the equations, we will need diagonalised forms of the matrices
+	# relating the derivatives of the simulated temperatures (T,Q,S) to
+	# themselves (the inhomogeneous part is dealt with later). In other
+	# words, if the system of equations is written in vector form as
+	# dA/dt = MA + B + Ct, for vectors A,B,C, we calculate and diagonalise
+	# the matrix M. The rows of the vectors are ordered T, Q, S.
+	#
+	# Each is only diagonalised on first use, since not every simulation
+	# passes through every regime.
+
+	@functools.cached_property
+	def _M_free(self):
+		# The free evolution of the system (i.e. the combination of eqs (1)
+		# (2) and (5)) when the storage heater is not charging (and hence
+		# there is no extra leakage).
+		k, h, j, C, C_q, C_sh = (
+			self.k, self.h, self.j_passive, self.C, self.C_q, self.C_sh
+		)
+		return DiagonalisedMatrix(np.array([
+			np.array([-k - h - j, h,    j ]) / C,
+			np.array([h,         -h,    0 ]) / C_q,
+			np.array([j,          0,    -j]) / C_sh
+		]))
+
+	@functools.cached_property
+	def _M_charging(self):
+		# When the storage heater is charging
+		k, h, j, C, C_q, C_sh = (
+			self.k, self.h, self.j_charging, self.C, self.C_q, self.C_sh
+		)
+		return DiagonalisedMatrix(np.array([
+			np.array([-k - h - j,  h,  j]) / C,
+			np.array([h,          -h,  0]) / C_q,
+			np.array([j,           0, -j]) / C_sh
+		]))
+
+	@functools.cached_property
+	def _M_discharging(self):
+		# Eqs (3) and (5) (and no change in T)
+		# Note that the T row is omitted
+		return DiagonalisedMatrix(np.array([
+			np.array([-self.h, 0]) / self.C_q,
+			np.array([self.h,  0]) / self.C_sh
+		]))
+
+	@functools.cached_property
+	def _M_equalised(self):
+		# Eqs (4) and (5)
+		# Note that the T and S rows are combined
+		return DiagonalisedMatrix(np.array([
+			np.array([-self.k - self.h,  self.h]) / (self.C_sh + self.C),
+			np.array([self.h,           -self.h]) / self.C_q
+		]))
 
 
 	def simulate_heat(self, init_vals, storage_heat, direct_heat, other_heat, outdoor_temps, min_temps):
@@ -205,6 +238,7 @@ class Building:
 		start_t = init_vals[0]
 		end_t = init_vals[0] + len(outdoor_temps) - 1
 		min_temps = sorted(min_temps, key=lambda x: x[0])
+		outdoor_temps = [float(A) for A in outdoor_temps]
 
 		# Create a list of all expected discontinuities and relevant time boundaries.
 		# The intervals between these can be solved analytically as a single step.
@@ -221,64 +255,79 @@ class Building:
 		step_boundaries = sorted(step_boundaries)
 		step_boundaries = [t for t in step_boundaries if start_t <= t <= end_t]
 
-		# Initialise an array of electricity consumption values with zeros
-		elec_use = np.zeros(2 * math.ceil(end_t - start_t))
+		# Find which heating periods and min_temp apply to each step (all at
+		# once, rather than searching for them at every step)
+		step_starts = step_boundaries[:-1]
+		thermostat = (direct_heat == "thermostat")
+		sh_idxs = _containing_intervals(storage_heat, step_starts)
+		if thermostat:
+			dh_idxs = [-1] * len(step_starts)
+		else:
+			dh_idxs = _containing_intervals(direct_heat, step_starts)
+		oh_idxs = _containing_intervals(other_heat, step_starts)
+		min_temp_idxs = np.searchsorted(
+			[x[0] for x in min_temps], step_starts, side="right"
+		) - 1
+		min_temp_idxs = np.maximum(min_temp_idxs, 0).tolist()
 
 		# Perform the simulation step-by-step
-		t = [start_t]
-		T = [init_vals[1]]
-		Q = [init_vals[2]]
-		S = [init_vals[3]]
-		min_temp_idx = 0
-		for t_a, t_b in zip(step_boundaries, step_boundaries[1:]):
+		# (the results of each step are collected and concatenated at the end)
+		t = [[start_t]]
+		T = [[init_vals[1]]]
+		Q = [[init_vals[2]]]
+		S = [[init_vals[3]]]
+		step_elec_use = []
+		for step_idx, (t_a, t_b) in enumerate(zip(step_boundaries, step_boundaries[1:])):
 			# Find the values of P(t) and I(t) for this step
 			P_direct = P_other = I = 0
-			if any(t_1 <= t_a < t_2 for t_1, t_2 in storage_heat):
+			if sh_idxs[step_idx] != -1:
 				I = self.sh_charge_pwr
-			if direct_heat == "thermostat":
-				thermostat = True
-			else:
-				thermostat = False
-				for h in direct_heat:
-					if h[0] <= t_a < h[1]:
-						assert h[0] <= t_b <= h[1]
-						P_direct = h[2]
-			for h in other_heat:
-				if h[0] <= t_a < h[1]:
-					assert h[0] <= t_b <= h[1]
-					P_other = h[2]
+			if dh_idxs[step_idx] != -1:
+				h = direct_heat[dh_idxs[step_idx]]
+				assert h[0] <= t_b <= h[1]
+				P_direct = h[2]
+			if oh_idxs[step_idx] != -1:
+				h = other_heat[oh_idxs[step_idx]]
+				assert h[0] <= t_b <= h[1]
+				P_other = h[2]
 			# Linearly interpolate to find the outdoor temperatures at t_a and t_b
-			outdoor_temps_ab = np.interp(
-				(t_a, t_b),
-				np.linspace(start_t, end_t, len(outdoor_temps)),
-				outdoor_temps
+			outdoor_temps_ab = (
+				_interp_hourly(outdoor_temps, t_a - start_t),
+				_interp_hourly(outdoor_temps, t_b - start_t)
 			)
-			# Determine the min_temp applicable to this step
-			while (
-				min_temp_idx < len(min_temps) - 1
-				and min_temps[min_temp_idx + 1][0] <= t_a
-			):
-				min_temp_idx += 1
-			min_temp = min_temps[min_temp_idx][1]
+			min_temp = min_temps[min_temp_idxs[step_idx]][1]
 			# Simulate the step
 			new_t, new_T, new_Q, new_S, actual_I, thstat_E = self._simulation_step(
 				(t_a, t_b),
-				(T[-1], Q[-1], S[-1]),
+				(T[-1][-1], Q[-1][-1], S[-1][-1]),
 				outdoor_temps_ab,
 				I,
 				P_direct + P_other,
 				min_temp,
 				thermostat
 			)
-			t.extend(new_t)
-			T.extend(new_T)
-			Q.extend(new_Q)
-			S.extend(new_S)
+			t.append(new_t)
+			T.append(new_T)
+			Q.append(new_Q)
+			S.append(new_S)
 			# Record the electricity usage for this step
-			i = int(2*(t_a-start_t))
-			elec_use[i] += thstat_E + (actual_I + P_direct) * (t_b - t_a)
+			step_elec_use.append(thstat_E + (actual_I + P_direct) * (t_b - t_a))
+
+		# Sum the electricity usage of the steps within each half-hour period
+		half_hour_idxs = (2 * (np.array(step_starts) - start_t)).astype(int)
+		elec_use = np.bincount(
+			half_hour_idxs,
+			weights=step_elec_use,
+			minlength=2 * math.ceil(end_t - start_t)
+		)
 
-		return t, T, Q, S, elec_use
+		return (
+			np.concatenate(t).tolist(),
+			np.concatenate(T).tolist(),
+			np.concatenate(Q).tolist(),
+			np.concatenate(S).tolist(),
+			elec_use
+		)
 
 	def _simulation_step(self, t_interval, init_vals, outdoor_temps, I, P, min_temp, thstat=False):
 		"""
@@ -321,19 +370,64 @@ class Building:
 		  thstat_E      The additional energy required for the heat demanded
 		                by thstat == True.
 		"""
-		# The returned arrays will contain at least this many values
-		num_sample_points = 100
+		# Simulate each regime in turn until the end of the step is reached
+		t_segs, T_segs, Q_segs, S_segs = [], [], [], []
+		actual_I = None
+		thstat_E = 0
+		while True:
+			t, T, Q, S, I, regime_thstat_E, continuation = self._simulate_regime(
+				t_interval, init_vals, outdoor_temps, I, P, min_temp, thstat
+			)
+			t_segs.append(t)
+			T_segs.append(T)
+			Q_segs.append(Q)
+			S_segs.append(S)
+			if actual_I is None:
+				actual_I = I
+			thstat_E += regime_thstat_E
+			if continuation is None:
+				break
+			t_interval, init_vals, outdoor_temps = continuation
+		# (concatenating all of the segments at once, to avoid repeated copying)
+		if len(t_segs) == 1:
+			return t, T, Q, S, actual_I, thstat_E
+		return (
+			np.concatenate(t_segs),
+			np.concatenate(T_segs),
+			np.concatenate(Q_segs),
+			np.concatenate(S_segs),
+			actual_I,
+			thstat_E
+		)
+
+	def _simulate_regime(self, t_interval, init_vals, outdoor_temps, I, P, min_temp, thstat):
+		"""
+		Helper function for _simulation_step(); simulate the step until either
+		its end or a change of regime.
 
+		Arguments are as for _simulation_step().
+
+		Returns (t, T, Q, S, actual_I, thstat_E, continuation), the first six
+		of which are as returned by _simulation_step() but only up to (and
+		excluding) any change of regime. continuation is None if the end of
+		the step was reached, otherwise a tuple of the t_interval, init_vals
+		and outdoor_temps arguments with which to simulate the remainder.
+		"""
 		start_t, end_t = t_interval
 		initial_T, initial_Q, initial_S = init_vals
 		sh_is_charging = (I > 0)
 		j = self.j_charging if sh_is_charging else self.j_passive
-		t_vals = np.linspace(start_t, end_t, num_sample_points)
 		thstat_E = 0
 
 		# Do nothing if the simulation length is 0
 		if start_t == end_t:
-			return ([start_t], [initial_T], [initial_Q], [initial_S], I, 0)
+			return ([start_t], [initial_T], [initial_Q], [initial_S], I, 0, None)
+
+		# Equivalent to np.linspace(start_t, end_t, len(_SAMPLE_INDICES)),
+		# but without its overhead
+		t_vals = _SAMPLE_INDICES * ((end_t - start_t) / (len(_SAMPLE_INDICES) - 1))
+		t_vals += start_t
+		t_vals[-1] = end_t
 
 		# Reduce I if necessary to prevent the storage heater from exceeding
 		# its maximum temperature. This uses a fairly rough calculation, but
@@ -404,7 +498,7 @@ class Building:
 				t_vals
 			)
 			eq1_RHS = (
-				self.k*(np.interp(t_vals, t_interval, outdoor_temps) - min_temp)
+				self.k*((U + V*t_vals) - min_temp)
 				+ self.h*(Q - T)
 				+ j * (S - T)
 				+ P
@@ -416,12 +510,27 @@ class Building:
 				S <= min_temp,
 				eq1_RHS <= 0
 			))
-			# Calculate the energy that the thermostatic heat must deliver
-			i = next(
-				(i for i, b in enumerate(termination_condition) if b),
-				len(termination_condition)
+			# Calculate the energy that the thermostatic heat must deliver up
+			# to the first element of termination_condition which is True.
+			# This is minus the integral of eq1_RHS, which can be evaluated
+			# exactly since (from eqns (2) and (5)) h(Q-T) = -C_q dQ/dt and
+			# j(S-T) = I - C_sh dS/dt.
+			i = (
+				np.argmax(termination_condition) if np.any(termination_condition)
+				else len(termination_condition)
 			)
-			thstat_E += - np.trapz(eq1_RHS[:i], t_vals[:i])
+			if i > 1:
+				t1 = t_vals[i-1]
+				duration = t1 - start_t
+				thstat_E -= (
+					self.k * (
+						(U - min_temp) * duration
+						+ V * (t1**2 - start_t**2) / 2
+					)
+					- self.C_q * (Q[i-1] - initial_Q)
+					- self.C_sh * (S[i-1] - initial_S)
+					+ (I + P) * duration
+				)
 
 		elif (
 			initial_T <= min_temp
@@ -430,20 +539,22 @@ class Building:
 		):
 			# The storage heater is at the same temperature as the property, and
 			# keeping it that way is advantageous.
-			T, Q, S = self._solve_eqns(t_vals, init_vals, "equalised", U, V, P, I)
+			T, Q, S = self._solve_eqns(t_vals, init_vals, _EQUALISED, U, V, P, I)
 			# If T ever rises above min_temp, terminate this step at that time
-			# and (recursively) treat the remainder of the t_interval as a new
-			# step. Otherwise just return the full simulated temperatures.
+			# and return what is needed for _simulation_step() to treat the
+			# remainder of the t_interval as a new step. Otherwise just return
+			# the full simulated temperatures.
 			termination_condition = T > min_temp
 
 		elif initial_T <= min_temp and initial_T < initial_S and eq1_initial_RHS <= 0:
 			assert initial_T == min_temp
 			# Use the storage heater to maintain min_temp for as long as possible.
-			T, Q, S = self._solve_eqns(t_vals, init_vals, "discharging", U, V, P, I)
+			T, Q, S = self._solve_eqns(t_vals, init_vals, _DISCHARGING, U, V, P, I)
 			# If ever S falls below min_temp or the heat flow into the property
 			# from sources other than the storage heater becomes sufficient to
-			# increase T, terminate this step at that time and (recursively) treat
-			# the remainder of the t_interval as a new step.
+			# increase T, terminate this step at that time and return what is
+			# needed for _simulation_step() to treat the remainder of the
+			# t_interval as a new step.
 			# Otherwise just return the full simulated temperatures.
 			A = U + V*t_vals
 			eq1_RHS = (
@@ -457,7 +568,7 @@ class Building:
 		else:
 			# It is either unnecessary or impossible to output heat from the
 			# storage heater, so simulate with heat transfer only by conduction
-			rgme = "charging" if sh_is_charging else "free"
+			rgme = _CHARGING if sh_is_charging else _FREE
 			T, Q, S = self._solve_eqns(t_vals, init_vals, rgme, U, V, P, I)
 			# The step should be terminated early if any of the three above
 			# regimes are entered.
@@ -493,32 +604,21 @@ class Building:
 			)
 
 		# If the regime changes partway through the step, only use the
-		# simulation thereto and treat the remainder of the step appropriately
-		# with a recursive call
+		# simulation thereto and return what is needed to treat the remainder
+		# of the step appropriately
 		#
 		# Sometimes floating point errors lead to termination_condition[0]
 		# being True, so only count subsequent elements.
 		i = 1 + np.argmax(termination_condition[1:])
 		if termination_condition[i]:  # i.e. if any(termination_condition)
-			t_2, T_2, Q_2, S_2, _, thstat_E_2 = self._simulation_step(
-				[t_vals[i], end_t],
+			continuation = (
+				(t_vals[i], end_t),
 				(T[i], Q[i], S[i]),
-				(U + V*t_vals[i], outdoor_temps[1]),
-				I,
-				P,
-				min_temp,
-				thstat
-			)
-			return (
-				np.concatenate((t_vals[:i], t_2)),
-				np.concatenate((T[:i], T_2)),
-				np.concatenate((Q[:i], Q_2)),
-				np.concatenate((S[:i], S_2)),
-				I,
-				thstat_E + thstat_E_2
+				(U + V*t_vals[i], outdoor_temps[1])
 			)
+			return t_vals[:i], T[:i], Q[:i], S[:i], I, thstat_E, continuation
 		else:
-			return t_vals, T, Q, S, I, thstat_E
+			return t_vals, T, Q, S, I, thstat_E, None
 
 	def _solve_eqns(self, t_vals, init_vals, regime, U, V, P, I):
 		"""
@@ -530,10 +630,10 @@ class Building:
 		  t_vals        The values of t at which to evaluate the values of
 		                T, Q and S.
 		  init_vals     The value of (T, Q, S) at t = t_vals[0].
-		  regime        A string indicating what regime to solve the equations
-		                in. Can take the values "free" or "charging" (both
+		  regime        One of the module constants indicating what regime to
+		                solve the equations in: _FREE or _CHARGING (both
 		                obeying eqns (1), (2) and (5), but with different
-		                j values), "discharging" (constant T) or "equalised"
+		                j values), _DISCHARGING (constant T) or _EQUALISED
 		                (T == S).
 		  U             The value of U in A(t) = U + Vt.
 		  V             The value of V in A(t) = U + Vt.
@@ -542,15 +642,12 @@ class Building:
 
 		Returns the arrays (T, Q, S) corresponding to t_vals.
 		"""
-		if regime in ["free", "charging"]:
+		if regime == _FREE or regime == _CHARGING:
 			# Solve eqs (1), (2) and (5).
 			eq1_const_term = (self.k * U + P) / self.C
 			eq1_linear_term = (self.k * V) / self.C
 			eq2_const_term = I / self.C_sh
-			if regime == "free":
-				M = self._ode_matrices["free"]
-			else:
-				M = self._ode_matrices["charging"]
+			M = self._M_free if regime == _FREE else self._M_charging
 			T, Q, S = solve_simple_vector_ODE(
 				t_vals[0],
 				init_vals,
@@ -559,20 +656,20 @@ class Building:
 				(eq1_linear_term, 0, 0),
 				t_vals
 			)
-		elif regime == "equalised":
+		elif regime == _EQUALISED:
 			# Solve eqs (4) and (5).
 			eq4_const = (self.k * U + P + I) / (self.C_sh + self.C)
 			eq4_linear = (self.k * V) / (self.C_sh + self.C)
 			T, Q = solve_simple_vector_ODE(
 				t_vals[0],
 				init_vals[:2],
-				self._ode_matrices["equalised"],
+				self._M_equalised,
 				(eq4_const, 0),
 				(eq4_linear, 0),
 				t_vals
 			)
 			S = T
-		elif regime == "discharging":
+		elif regime == _DISCHARGING:
 			# Solve eqs (3) and (5)
 			T_held = init_vals[0]
 			eq3_const = (U*self.k + P + I - (self.k+self.h) * T_held) / self.C_sh
@@ -582,7 +679,7 @@ class Building:
 			Q, S = solve_simple_vector_ODE(
 				t_vals[0],
 				init_vals[1:],
-				self._ode_matrices["discharging"],
+				self._M_discharging,
 				(eq5_const, eq3_const),
 				(0, eq3_linear),
 				t_vals
@@ -591,6 +688,47 @@ class Building:
 
 
 
+def _containing_intervals(intervals, t_vals):
+	"""
+	Return a list giving the index of the interval which contains each of t_vals.
+
+	intervals should be a sequence of non-overlapping tuples, the first two
+	elements of each giving the start (inclusive) and end (exclusive) of an
+	interval. Elements of t_vals which are not in any interval are given the
+	index -1. Zero-length intervals (including any with an end before their
+	start) contain no t values, so are ignored even if they lie within another
+	interval.
+	"""
+	starts = np.array([x[0] for x in intervals], dtype=float)
+	ends = np.array([x[1] for x in intervals], dtype=float)
+	nonempty = np.flatnonzero(ends > starts)
+	if len(nonempty) == 0:
+		return [-1] * len(t_vals)
+	order = nonempty[np.argsort(starts[nonempty], kind="stable")]
+	starts, ends = starts[order], ends[order]
+	# Find the last interval starting at or before each t, then check whether
+	# t is before its end
+	i = np.searchsorted(starts, t_vals, side="right") - 1
+	i_clipped = np.maximum(i, 0)
+	contained = (i >= 0) & (np.asarray(t_vals, dtype=float) < ends[i_clipped])
+	return np.where(contained, order[i_clipped], -1).tolist()
+
+def _interp_hourly(vals, t):
+	"""
+	Return the value at time t linearly interpolated from vals.
+
+	vals should be a sequence of values at t = 0, 1, 2, ...; values of t
+	outside this range take the value at the nearest end. This is equivalent
+	to (but for scalar t much quicker than) np.interp().
+	"""
+	if t <= 0:
+		return vals[0]
+	if t >= len(vals) - 1:
+		return vals[-1]
+	i = int(t)
+	return vals[i] + (t - i) * (vals[i+1] - vals[i])
+
+
 def solve_simple_vector_ODE(t0, Y0, M, A, B, t_vals):
 	"""
 	Return the solution to an ODE of the form Y'(t) = M Y(t) + A + Bt (for
@@ -601,50 +739,54 @@ def solve_simple_vector_ODE(t0, Y0, M, A, B, t_vals):
 
 	M is specified as a DiagonalisedMatrix.
 
-	Returns a list of the solutions for each component of Y.
+	Returns a 2D array, the rows of which are the solutions for each component
+	of Y.
 	"""
+	t_vals = np.asarray(t_vals, dtype=float)
 	# Defining Z := E_inv @ Y, the equation becomes:
 	#   Z'(t) = np.diag(e) @ Z(t) + E_inv @ A + E_inv @ B * t
 	# which can be solved component-wise by solve_simple_ODE().
-	Z = np.array([
-		solve_simple_ODE(t0, f0, e_i, c, d, t_vals)
-		for f0, e_i, c, d in zip(M.E_inv @ Y0, M.e, M.E_inv @ A, M.E_inv @ B)
-	])
-	# Then use Y = E @ Z
-	Y = [
-		sum(
-			E_component * Z_component
-			for E_component, Z_component in zip(row, Z)
+	Z = np.empty((len(M.e), len(t_vals)), dtype=np.result_type(M.E, float))
+	# (transform Y0, A and B into the eigenbasis with a single product)
+	Z0, A_diag, B_diag = (M.E_inv @ np.array((Y0, A, B), dtype=float).T).T
+	for i in range(len(M.e)):
+		solve_simple_ODE(
+			t0, Z0[i], M.e[i], A_diag[i], B_diag[i], t_vals, out=Z[i]
 		)
-		for row in M.E
-	]
-	return Y
+	# Then use Y = E @ Z
+	return M.E @ Z
 
 
-def solve_simple_ODE(t0, f0, X, Y, Z, t_vals):
+def solve_simple_ODE(t0, f0, X, Y, Z, t_vals, out=None):
 	"""
 	Return the solution to an ODE of the form f'(t) = Xf(t) + Y + Zt (for
 	constant X, Y, Z), evaluated at the specified t values. The initial
 	condition is f(t0) = f0.
+
+	If out is specified, it should be an array of the same length as t_vals,
+	into which the result is written (and which is then returned).
 	"""
+	t_vals = np.asarray(t_vals, dtype=float)
 	# Subsitute constants and t_vals into algebraic solution
 	if X == 0:
 		C = f0 - Y * t0 - Z * (t0 ** 2) / 2
-		return C + Y * t_vals + Z * (t_vals ** 2) / 2
+		result = C + Y * t_vals + Z * (t_vals ** 2) / 2
+		if out is None:
+			return result
+		out[...] = result
+		return out
 	else:
-		t_vals = np.array(t_vals)
-		exp_part = np.exp(X * (t_vals - t0))
 		reciprcl_X = X ** -1
 		reciprcl_X_sqrd = reciprcl_X * reciprcl_X
-		return (
-			exp_part * (
-				f0
-				+ reciprcl_X * (Z*t0 + Y)
-				+ reciprcl_X_sqrd * Z
-			)
-			- reciprcl_X * (Z * t_vals + Y)
-			- reciprcl_X_sqrd * Z
-		)
+		# Evaluate the solution in place as far as possible, to avoid
+		# allocating temporary arrays
+		out = np.subtract(t_vals, t0, out=out)
+		out *= X
+		np.exp(out, out=out)
+		out *= f0 + reciprcl_X * (Z*t0 + Y) + reciprcl_X_sqrd * Z
+		out -= (reciprcl_X * Z) * t_vals
+		out -= reciprcl_X * Y + reciprcl_X_sqrd * Z
+		return out
 
 
 
@@ -17,9 +17,12 @@ def midnight_tonight(local=False):
 	in config.TIME_ZONE. If local is False (the default), it will be converted
 	to UTC before returning.
 	"""
-	now = datetime.datetime.now(zoneinfo.ZoneInfo(config.TIME_ZONE))
-	midnight_this_morning = now.replace(hour=0, minute=0, second=0, microsecond=0)
-	midnight_tonight = midnight_this_morning + datetime.timedelta(days=1)
+	# (ZoneInfo() caches instances itself, so this doesn't reread the tzdata)
+	time_zone = zoneinfo.ZoneInfo(config.TIME_ZONE)
+	tomorrow = datetime.datetime.now(time_zone).date() + datetime.timedelta(days=1)
+	midnight_tonight = datetime.datetime.combine(
+		tomorrow, datetime.time.min, time_zone
+	)
 	if not local:
 		midnight_tonight = midnight_tonight.astimezone(datetime.timezone.utc)
 	return midnight_tonight
@@ -70,5 +73,14 @@ def datetime_str_sequence(start, step, format=r"%Y-%m-%dT%H:%M:%SZ", seq_length=
 	result a repeated time when the clocks go back 1 hour and a skipped
 	time when they go forward an hour.
 	"""
-	for dt in datetime_sequence(start, step, seq_length):
-		yield dt.strftime(format)
+	if format == r"%Y-%m-%dT%H:%M:%SZ":
+		# Format the default directly, which is considerably faster than
+		# strftime()
+		for dt in datetime_sequence(start, step, seq_length):
+			yield (
+				f"{dt.year:04d}-{dt.month:02d}-{dt.day:02d}"
+				f"T{dt.hour:02d}:{dt.minute:02d}:{dt.second:02d}Z"
+			)
+	else:
+		for dt in datetime_sequence(start, step, seq_length):
+			yield dt.strftime(format)
@@ -6,6 +6,7 @@ The building and optimisation parameters are speecified in config.py.
 """
 
 
+import bisect
 import datetime
 import warnings
 import re
@@ -103,16 +104,32 @@ def heating_options(
 	# Adjust temp_ranges in line with the configured IGNORE_INITIAL_TEMP_HOURS
 	num_hours_to_ignore = config.IGNORE_INITIAL_TEMP_HOURS
 	if num_hours_to_ignore > 0:
-		while len(temp_ranges) > 1 and temp_ranges[1][0] <= num_hours_to_ignore:
-			temp_ranges = temp_ranges[1:]
+		# (discard all but the last of those starting before then)
+		first_idx = bisect.bisect_right(
+			[x[0] for x in temp_ranges], num_hours_to_ignore
+		) - 1
+		temp_ranges = temp_ranges[max(first_idx, 0):]
 		if temp_ranges[0][0] < num_hours_to_ignore:
 			temp_ranges[0] = (num_hours_to_ignore,) + temp_ranges[0][1:]
 		temp_ranges = [(0, -np.inf, np.inf)] + temp_ranges
 
+	# Calculate useful energies (all at once, since they can mostly share a
+	# single simulation)
+	end_ts = [(t - start_time) / datetime.timedelta(hours=1) for t in end_times]
+	useful_energies = price_optimisation.useful_heat_energies(
+		building,
+		temp_ranges,
+		(0, start_indoor_temp),
+		[(0, np.inf, config.OTHER_HEAT_OUTPUT/24)],
+		outdoor_temps,
+		end_ts
+	)
+
 	output = []
+	# (each optimisation is seeded with the result for the previous end_time)
+	prev_heat = None
 	print(f"\r0/{len(end_times)}", end="")
-	for i, end_time in enumerate(end_times):
-		end_t = (end_time - start_time) / datetime.timedelta(hours=1)
+	for i, (end_t, useful_energy) in enumerate(zip(end_ts, useful_energies)):
 		# Perform the optimisation
 		s_heat, d_heat, tot_energy, cost, act_end_t, sim_temps = (
 		price_optimisation.cheapest_heat(
@@ -125,18 +142,11 @@ def heating_options(
 			prices,
 			end_t,
 			num_heats,
-			config.HEATING_PERIOD_PENALTY
+			config.HEATING_PERIOD_PENALTY,
+			init_heat=prev_heat
 		))
+		prev_heat = (s_heat, d_heat)
 		t, T, Q, S = sim_temps
-		# Calculate useful energy
-		useful_energy = price_optimisation.useful_heat_energy(
-			building,
-			temp_ranges,
-			(0, start_indoor_temp),
-			[(0, np.inf, config.OTHER_HEAT_OUTPUT/24)],
-			outdoor_temps,
-			end_t
-		)
 		# Remove zero heat inputs and convert t values back into datetimes
 		s_heat = [
 			(
@@ -166,18 +176,19 @@ def heating_options(
 		out_dict["useful_energy"] = useful_energy
 		out_dict["t"] = t
 		out_dict["T"] = T
-		if len(output) == 0:
-			out_dict["marginal_price"] = cost
-			out_dict["marg_tot_energy"] = tot_energy
-			out_dict["marg_usfl_enrgy"] = useful_energy
-		else:
-			out_dict["marginal_price"] = cost - output[-1]["total_price"]
-			out_dict["marg_tot_energy"] = tot_energy - output[-1]["total_energy"]
-			out_dict["marg_usfl_enrgy"] = useful_energy - output[-1]["useful_energy"]
 		output.append(out_dict)
 		# Print progress
 		print(f"\r{i+1}/{len(end_times)}", end="")
 	print()
+	# Calculate the marginal values (relative to the previous end_time)
+	for key, marginal_key in (
+		("total_price", "marginal_price"),
+		("total_energy", "marg_tot_energy"),
+		("useful_energy", "marg_usfl_enrgy"),
+	):
+		marginal_vals = np.diff([x[key] for x in output], prepend=0).tolist()
+		for out_dict, marginal_val in zip(output, marginal_vals):
+			out_dict[marginal_key] = marginal_val
 	output.sort(key=lambda x: x["lasts_until"])
 	return output
 
@@ -13,6 +13,7 @@ obtained manually.
 
 import os
 import datetime
+import functools
 import zoneinfo
 
 import numpy as np
@@ -110,7 +111,9 @@ class ParallelDenseLayer(keras.layers.Layer):
 		)
 
 	def call(self, inputs):
-		return tf.reduce_sum(tf.multiply(tf.expand_dims(inputs, -1), self.kernel), -2) + self.bias
+		# (a single contraction, rather than broadcasting to shape (..., n, m, q)
+		# and then summing)
+		return tf.einsum("...nm,nmq->...nq", inputs, self.kernel) + self.bias
 
 
 def get_model_input(date, demand_data, wind_data, price_data):
@@ -152,33 +155,15 @@ def get_model_input(date, demand_data, wind_data, price_data):
 		datetime.time(23, 00, 00, tzinfo=local_tz)
 	)
 	prev_day_start = forecast_start.astimezone(datetime.timezone.utc) - one_day
-	all_settlmnt_prds = list(misc.datetime_sequence(prev_day_start, 0.5, 96))
+	all_settlmnt_prds = _settlement_periods(prev_day_start, 96)
 
-	# Assemble demand data
-	demand_vals = []
-	for ts in all_settlmnt_prds:
-		if ts in demand_data:
-			demand_vals.append(demand_data[ts])
-	if len(demand_vals) < 96:
-		# demand_data doesn't contain all of the necessary data to forecast this
-		# settlement period
-		return None
-	# Assemble wind generation data
-	wind_vals = []
-	for ts in all_settlmnt_prds:
-		if ts in wind_data:
-			wind_vals.append(wind_data[ts])
-	if len(wind_vals) < 96:
-		# wind_data doesn't contain all of the necessary data to forecast this
-		# settlement period
-		return None
-	# Assemble prior price data
-	prior_prices = []
-	for ts in all_settlmnt_prds[:48]:
-		if ts in price_data:
-			prior_prices.append(price_data[ts])
-	if len(prior_prices) < 48:
-		# prior_prices doesn't contain all of the necessary data to forecast this
+	# Assemble the demand, wind generation and prior price data
+	try:
+		demand_vals = np.array([demand_data[ts] for ts in all_settlmnt_prds])
+		wind_vals = np.array([wind_data[ts] for ts in all_settlmnt_prds])
+		prior_prices = np.array([price_data[ts] for ts in all_settlmnt_prds[:48]])
+	except KeyError:
+		# The data doesn't contain all of the necessary values to forecast this
 		# settlement period
 		return None
 	# Calculate the date as a number of days since 2020-01-01
@@ -188,13 +173,16 @@ def get_model_input(date, demand_data, wind_data, price_data):
 	)
 
 	# Create and return the actual input arrays
-	input_0 = np.array(
-		  [np.mean( demand_vals[4*i : 4*(i+1)]) for i in range(24)]
-		+ [np.mean(   wind_vals[4*i : 4*(i+1)]) for i in range(24)]
-		+ [np.mean(prior_prices[4*i : 4*(i+1)]) for i in range(12)]
-		+ [date.weekday(), day_num]
-	)
-	input_1 = np.transpose([demand_vals[48:96], wind_vals[48:96]])
+	# (the means are calculated as sums / 4, which is exactly equivalent but
+	# avoids the additional overhead of ndarray.mean())
+	input_0 = np.empty(62)
+	np.sum(demand_vals.reshape(24, 4), axis=1, out=input_0[:24])
+	np.sum(wind_vals.reshape(24, 4), axis=1, out=input_0[24:48])
+	np.sum(prior_prices.reshape(12, 4), axis=1, out=input_0[48:60])
+	input_0[:60] /= 4
+	input_0[60] = date.weekday()
+	input_0[61] = day_num
+	input_1 = np.stack((demand_vals[48:96], wind_vals[48:96]), axis=1)
 	return input_0, input_1
 
 def construct_output_array(date, price_data):
@@ -217,7 +205,7 @@ def construct_output_array(date, price_data):
 		datetime.time(23, 00, 00, tzinfo=local_tz)
 	)
 	forecast_start = forecast_start.astimezone(datetime.timezone.utc)
-	all_settlmnt_prds = misc.datetime_sequence(forecast_start, 0.5, 48)
+	all_settlmnt_prds = _settlement_periods(forecast_start, 48)
 	prices = []
 	for ts in all_settlmnt_prds:
 		if ts in price_data:
@@ -227,6 +215,17 @@ def construct_output_array(date, price_data):
 	else:
 		return prices
 
+def _settlement_periods(start, num_periods):
+	"""
+	Return a list of the start times of num_periods consecutive settlement
+	periods, beginning at the UTC datetime.datetime start.
+
+	Equivalent to list(misc.datetime_sequence(start, 0.5, num_periods)),
+	but considerably faster for UTC datetimes.
+	"""
+	half_hour = datetime.timedelta(minutes=30)
+	return [start + i * half_hour for i in range(num_periods)]
+
 def _get_data_from_csvs():
 	"""
 	Return the price, demand and wind_generation data found in the csv files
@@ -235,31 +234,54 @@ def _get_data_from_csvs():
 	The dictionaries are as returned by data.load_csv_time_series(), except
 	with values converted to floats.
 	"""
-	prices = data.load_csv_time_series(
-		os.path.join(config.DATA_DIRECTORY, config.PRICE_FILE),
-		"Start Time",
-		"Price (p/kWh)",
-		config.FILE_DATETIME_FORMAT
+	prices = _load_float_time_series(
+		config.PRICE_FILE, "Start Time", "Price (p/kWh)"
 	)
-	prices = {t:float(prices[t]) for t in prices}
-	demand = data.load_csv_time_series(
-		os.path.join(config.DATA_DIRECTORY, config.NAT_GRID_DEMAND_FILE),
-		"Time",
-		"Demand / GW",
-		config.FILE_DATETIME_FORMAT
+	demand = _load_float_time_series(
+		config.NAT_GRID_DEMAND_FILE, "Time", "Demand / GW"
 	)
-	demand = {t:float(demand[t]) for t in demand}
-	wind_gen = data.load_csv_time_series(
-		os.path.join(config.DATA_DIRECTORY, config.NAT_GRID_WIND_FILE),
-		"Time",
-		"Wind Generation / GW",
-		config.FILE_DATETIME_FORMAT
+	wind_gen = _load_float_time_series(
+		config.NAT_GRID_WIND_FILE, "Time", "Wind Generation / GW"
 	)
-	wind_gen = {t:float(wind_gen[t]) for t in wind_gen}
 	return prices, demand, wind_gen
 
+def _load_float_time_series(file_name, time_col, val_col):
+	"""
+	Helper function for _get_data_from_csvs(); return the time series in the
+	specified file in config.DATA_DIRECTORY as a dictionary of floats.
+
+	Uses data.load_csv_time_series_arrays(), so that the values are parsed
+	in bulk (and only once while the file is unchanged).
+	"""
+	times, values = data.load_csv_time_series_arrays(
+		os.path.join(config.DATA_DIRECTORY, file_name),
+		time_col,
+		val_col,
+		config.FILE_DATETIME_FORMAT
+	)
+	UTC = datetime.timezone.utc
+	times = times.astype("datetime64[s]").astype(object)
+	return {t.replace(tzinfo=UTC) : v for t, v in zip(times, values.tolist())}
 
 
+
+@functools.lru_cache(maxsize=1)
+def _load_model(file_path, file_version):
+	"""
+	Load the forecast model from the specified file.
+
+	The file's modification time, size and inode are taken as an additional
+	argument so that the model is only reloaded (by repeated calls to
+	gen_price_forecast()) if the file has changed or been replaced.
+	"""
+	return keras.models.load_model(
+		file_path,
+		custom_objects={
+			"loss_func": loss_func,
+			"ParallelDenseLayer": ParallelDenseLayer
+		}
+	)
+
 def gen_price_forecast():
 	"""
 	Forecast the price for as many settlement periods as possible.
@@ -272,13 +294,11 @@ def gen_price_forecast():
 	grid demand and wind generation forecasts, and that containing the Agile
 	Octopus prices.
 	"""
+	model_path = os.path.join(config.DATA_DIRECTORY, config.FORECAST_MODEL_FILE)
 	try:
-		model = keras.models.load_model(
-			os.path.join(config.DATA_DIRECTORY, config.FORECAST_MODEL_FILE),
-			custom_objects={
-				"loss_func": loss_func,
-				"ParallelDenseLayer": ParallelDenseLayer
-			}
+		stat = os.stat(model_path)
+		model = _load_model(
+			model_path, (stat.st_mtime_ns, stat.st_size, stat.st_ino)
 		)
 	except (FileNotFoundError, OSError):
 		# No model file, so we can't produce any forecast
@@ -301,10 +321,13 @@ def gen_price_forecast():
 			# (and therefore won't for any subsequent days)
 			break
 		try:
-			frcst_prices = list(model.predict(
+			# (each day depends on the previous day's forecast, so the days
+			# can't be batched; calling the model directly avoids the
+			# considerable per-call overhead of model.predict())
+			frcst_prices = np.asarray(model(
 				[np.array([inputs[0]]), np.array([inputs[1]])],
-				verbose=0
-			)[0])
+				training=False
+			))[0]
 		except ValueError:
 			# The model encountered an error (e.g. get_model_input() has
 			# changed since the model was trained), so terminate and return
@@ -324,8 +347,7 @@ def gen_price_forecast():
 			# this properly, so make a crude approximation by repeating
 			# the prices the model produced for the first instances of
 			# 01:00 and 01:30 at their second occurences.
-			frcst_prices.insert(6, frcst_prices[4])
-			frcst_prices.insert(7, frcst_prices[5])
+			frcst_prices = np.insert(frcst_prices, 6, frcst_prices[4:6])
 			frcst_times.extend([
 				frcst_end_time,                                 # 22:00
 				frcst_end_time + datetime.timedelta(hours=0.5)  # 22:30
@@ -335,12 +357,11 @@ def gen_price_forecast():
 			# There isn't enough data to train the model to handle this
 			# properly, so make a crude approximation by simply removing
 			# the prices forecast for these times.
-			frcst_prices = frcst_prices[:4] + frcst_prices[6:]
+			frcst_prices = np.delete(frcst_prices, [4, 5])
 			frcst_times = frcst_times[:46]
 		elif frcst_end_local_time.hour != 23:
 			# This shouldn't happen during a normal DST switchover
 			raise RuntimeError("Unexpected timezone behaviour")
 		# Then actually record the forecast
-		for time, price in zip(frcst_times, frcst_prices):
-			prices[time] = price
+		prices.update(zip(frcst_times, frcst_prices.tolist()))
 	return {t:prices[t] for t in prices if t > last_known_price_time}
@@ -3,7 +3,11 @@ Optimise electricity usage to minimise cost on Octopus Energy's agile tariff.
 """
 
 
+import atexit
 import datetime
+import functools
+import itertools
+import multiprocessing
 import zoneinfo
 
 import numpy as np
@@ -28,29 +32,30 @@ def cheapest_window(length, prices):
 	(timezone aware datetime.datetime) as keys and the corresponding unit
 	prices as values.
 	"""
-	# Convert all times to UTC
-	arg_times = {t.astimezone(datetime.timezone.utc) : t for t in prices}
-	prices = {t.astimezone(datetime.timezone.utc) : prices[t] for t in prices}
 	# Convert length to units of half-hours
 	length = int(2*length)
-	# Try every start time to find the cheapest
-	best_average_price = None
-	best_start_time = None
-	times = sorted(prices.keys())
-	for start_idx, start_time in enumerate(times[: 1+len(times)-length]):
-		window_times = times[start_idx : start_idx + length]
-		no_gaps = all(
-			t_1 + datetime.timedelta(hours=0.5) == t_2
-			for t_1, t_2 in zip(window_times, window_times[1:])
-		)
-		if no_gaps:
-			avg_price = sum(prices[t] for t in window_times) / length
-			if best_average_price is None or avg_price <= best_average_price:
-				best_average_price = avg_price
-				best_start_time = start_time
-	if best_start_time is not None:
-		best_start_time = arg_times[best_start_time]
-	return best_start_time, best_average_price
+	if len(prices) < length:
+		return None, None
+	# Sort the times chronologically as POSIX timestamps (which avoids any
+	# timezone conversion)
+	times = list(prices.keys())
+	timestamps = np.array([t.timestamp() for t in times])
+	order = np.argsort(timestamps, kind="stable")
+	timestamps = timestamps[order]
+	# Find the average price of every window of consecutive times
+	price_arr = np.array([prices[times[i]] for i in order], dtype=float)
+	windows = np.lib.stride_tricks.sliding_window_view(price_arr, length)
+	avg_prices = windows.sum(axis=1) / length
+	# Exclude those which contain gaps (using the cumulative number of gaps
+	# to count those in each window)
+	num_gaps = np.concatenate(([0], np.cumsum(np.diff(timestamps) != 1800)))
+	no_gaps = num_gaps[length-1:] == num_gaps[:len(num_gaps)-length+1]
+	if not np.any(no_gaps):
+		return None, None
+	# Find the cheapest (preferring the latest in the event of a tie)
+	best_average_price = np.min(avg_prices[no_gaps])
+	start_idx = np.flatnonzero(no_gaps & (avg_prices == best_average_price))[-1]
+	return times[order[start_idx]], float(best_average_price)
 
 
 def temp_ranges_from_config(start_datetime, start_t, end_t):
@@ -83,7 +88,8 @@ def temp_ranges_from_config(start_datetime, start_t, end_t):
 
 
 def cheapest_heat(building, temp_ranges, init_vals, dh_max_pow, other_heat,
-                  outdoor_temps, prices, end_t, num_heats, penalty_per_heat):
+                  outdoor_temps, prices, end_t, num_heats, penalty_per_heat,
+                  init_heat=None):
 	"""
 	Return the cheapest heating which maintains acceptable temperatures for
 	the specified time.
@@ -136,6 +142,10 @@ def cheapest_heat(building, temp_ranges, init_vals, dh_max_pow, other_heat,
 	                    setting timers manually.
 	                    The penalty is added during the optimisation process,
 	                    but will not be included in the returned cost value.
+	  init_heat         Optionally, a tuple of (storage_heat, direct_heat) as
+	                    returned by a previous call (e.g. for a shorter end_t)
+	                    with which to seed the optimisation. The search is
+	                    unaffected if this is None (the default).
 
 	For the cheapest heating scheme found, returns:
 	  storage_heat      The storage_heat argument to building.simulate_heat()
@@ -152,6 +162,9 @@ def cheapest_heat(building, temp_ranges, init_vals, dh_max_pow, other_heat,
 	if len(init_vals) == 2:
 		init_vals = (start_t, init_vals[1], init_vals[1], init_vals[1])
 	temp_ranges = sorted(temp_ranges, key=lambda x: x[0])
+	# (convert prices to an array once, rather than in every call to the cost
+	# function)
+	prices = np.asarray(prices, dtype=float)
 
 	if num_heats > 0:
 		# Heating times must be between the start of the simulation and the end
@@ -169,6 +182,21 @@ def cheapest_heat(building, temp_ranges, init_vals, dh_max_pow, other_heat,
 		# We only need to know whether temps are maintained until end_t, so
 		# truncate the simulation just thereafter for performance reasons.
 		od_temps = outdoor_temps[: 2 + int(end_t - start_t)]
+		# Convert any initial guess into an argument for the cost function
+		if init_heat is None:
+			x0 = None
+		else:
+			lower_bounds, upper_bounds = np.array(bounds).T
+			x0 = np.clip(
+				_sim_heat_arr(*init_heat, start_t, num_heats),
+				lower_bounds,
+				upper_bounds
+			)
+		# Evaluate the cost function in parallel if configured to (reusing the
+		# same processes for every optimisation)
+		workers = config.HEAT_OPTIMISATION_THREADS
+		if workers != 1:
+			workers = _process_pool(None if workers == -1 else workers).map
 		# Use differential evolution to find the optimum argument for the cost
 		# function.
 		s = scipy.optimize.differential_evolution(
@@ -176,13 +204,15 @@ def cheapest_heat(building, temp_ranges, init_vals, dh_max_pow, other_heat,
 			bounds,
 			args=(
 				building, temp_ranges, init_vals, other_heat,
-				od_temps, prices, end_t, penalty_per_heat
+				od_temps, prices, end_t, penalty_per_heat,
+				next(_optimisation_ids)
 			),
 			popsize=config.HEAT_OPTIMISATION_POPSIZE,
 			atol=.5, # i.e. half a penny
 			polish=True,
-			workers=config.HEAT_OPTIMISATION_THREADS,
-			updating="deferred"
+			workers=workers,
+			updating="deferred",
+			x0=x0
 		).x
 	else:
 		# No need to perform optimisation if no heating is allowed
@@ -199,13 +229,52 @@ def cheapest_heat(building, temp_ranges, init_vals, dh_max_pow, other_heat,
 
 	return storage_heat, direct_heat, sum(usage), cost, actual_end_t, (t, T, Q, S)
 
+@functools.cache
+def _process_pool(num_processes):
+	"""
+	Return a multiprocessing.Pool with the specified number of processes.
+
+	The same pool is returned by all calls with the same argument, so that
+	the worker processes needn't be restarted for every optimisation. The
+	pool is closed (and its processes joined) when the interpreter exits.
+	If num_processes is None, the number of CPUs is used.
+	"""
+	pool = multiprocessing.Pool(num_processes)
+	atexit.register(_close_pool, pool)
+	return pool
+
+def _close_pool(pool):
+	"""
+	Close pool and wait for its worker processes to exit.
+	"""
+	pool.close()
+	pool.join()
+
+# A unique ID for each optimisation performed by cheapest_heat()
+_optimisation_ids = itertools.count()
+
+# The costs calculated by _cheapest_heat_cost_func() in this process (whether
+# the main process or a worker in the _process_pool()) for the optimisation
+# with ID _cost_cache_id, keyed by the (rounded) heating which was simulated.
+_COST_CACHE_SIZE = 4096
+_cost_cache = {}
+_cost_cache_id = None
+
 def _cheapest_heat_cost_func(s, building, temp_ranges, init_vals, other_heat,
-                             outdoor_temps, prices, end_t, penalty_per_heat):
+                             outdoor_temps, prices, end_t, penalty_per_heat,
+                             optimisation_id=None):
 	"""
 	The objective function for the optimisation in cheapest_heat()
 
 	temp_ranges must be pre-sorted by t value ascending.
+
+	Since many different values of s round to the same heating, the cost of
+	each heating simulated is cached (per process) so that it needn't be
+	simulated again, unless optimisation_id is None. optimisation_id should
+	uniquely identify the values of the other arguments; the cache is emptied
+	whenever it changes.
 	"""
+	global _cost_cache_id
 	start_t = init_vals[0]
 	# Construct the (rounded) heat arguments for the simulation.
 	# The heating should end at the end of the available prices.
@@ -226,6 +295,14 @@ def _cheapest_heat_cost_func(s, building, temp_ranges, init_vals, other_heat,
 			cost += 1e20
 	if cost != 0:
 		return cost
+	# Reuse the result of any previous simulation of the same heating
+	key = (tuple(storage_heat), tuple(direct_heat))
+	if optimisation_id is not None:
+		if optimisation_id != _cost_cache_id:
+			_cost_cache.clear()
+			_cost_cache_id = optimisation_id
+		elif key in _cost_cache:
+			return _cost_cache[key]
 	# Perform the simulation
 	t, T,Q,S, usage = building.simulate_heat(
 		init_vals, storage_heat, direct_heat, other_heat, outdoor_temps, temp_ranges
@@ -240,6 +317,11 @@ def _cheapest_heat_cost_func(s, building, temp_ranges, init_vals, other_heat,
 	num_penalties = len([t for t in sh_lengths if t > 0])
 	num_penalties += len([E for E in dh_energies if E > 0])
 	cost += num_penalties * penalty_per_heat
+	if optimisation_id is not None:
+		if len(_cost_cache) >= _COST_CACHE_SIZE:
+			# (evict the oldest entry)
+			del _cost_cache[next(iter(_cost_cache))]
+		_cost_cache[key] = cost
 	return cost
 
 def _first_deviation_from_acceptable(t, T, temp_ranges):
@@ -254,39 +336,37 @@ def _first_deviation_from_acceptable(t, T, temp_ranges):
 	Ignores the T value(s) at the first t value (since floating point errors
 	etc. may result in an unacceptable initial temperature)
 	"""
-	min_temp, max_temp = temp_ranges[0][1:]
-	next_temp_range_idx = 1
-	start_idx = next((a for a,b in enumerate(t) if b>t[0]), 0)
-	for t_val, T_val in zip(t[start_idx:], T[start_idx:]):
-		# Determine what temp_range applies to this t value
-		while (
-			next_temp_range_idx < len(temp_ranges)
-			and temp_ranges[next_temp_range_idx][0] < t_val
-		):
-			min_temp, max_temp = temp_ranges[next_temp_range_idx][1:]
-			next_temp_range_idx += 1
-		# Use the more permissive of the two limits for t values
-		# exactly at the changeover between different time periods.
-		if (
-			next_temp_range_idx < len(temp_ranges)
-			and temp_ranges[next_temp_range_idx][0] == t_val
-		):
-			min_temp = min(
-				temp_ranges[next_temp_range_idx - 1][1],
-				temp_ranges[next_temp_range_idx][1]
-			)
-			max_temp = max(
-				temp_ranges[next_temp_range_idx - 1][2],
-				temp_ranges[next_temp_range_idx][2]
-			)
-		# Check if the T value is acceptable
-		if not (
-			min_temp <= T_val <= max_temp
-			or np.isclose(min_temp, T_val)
-			or np.isclose(max_temp, T_val)
-		):
-			# This T value is unacceptable
-			return t_val
+	t_vals = np.asarray(t, dtype=float)
+	T_vals = np.asarray(T, dtype=float)
+	range_ts, min_temps, max_temps = (
+		np.array(x, dtype=float) for x in zip(*temp_ranges)
+	)
+	# Determine which temp_range applies to each t value (i.e. the last to
+	# start strictly before it, or the first if there is none)
+	range_idxs = np.searchsorted(range_ts, t_vals, side="left") - 1
+	np.maximum(range_idxs, 0, out=range_idxs)
+	min_T = min_temps[range_idxs]
+	max_T = max_temps[range_idxs]
+	# Use the more permissive of the two limits for t values
+	# exactly at the changeover between different time periods.
+	next_idxs = np.minimum(range_idxs + 1, len(range_ts) - 1)
+	at_changeover = (range_idxs + 1 < len(range_ts)) & (range_ts[next_idxs] == t_vals)
+	if np.any(at_changeover):
+		min_T = np.where(at_changeover, np.minimum(min_T, min_temps[next_idxs]), min_T)
+		max_T = np.where(at_changeover, np.maximum(max_T, max_temps[next_idxs]), max_T)
+	# Check which T values are acceptable (only resorting to the more
+	# expensive np.isclose() for those which are strictly out of range)
+	unacceptable = ~((min_T <= T_vals) & (T_vals <= max_T))
+	unacceptable_idxs = np.flatnonzero(unacceptable)
+	unacceptable[unacceptable_idxs] = ~(
+		np.isclose(min_T[unacceptable_idxs], T_vals[unacceptable_idxs])
+		| np.isclose(max_T[unacceptable_idxs], T_vals[unacceptable_idxs])
+	)
+	# Ignore the initial value(s)
+	unacceptable[:np.argmax(t_vals > t_vals[0])] = False
+	if np.any(unacceptable):
+		# Return the t value of the first unacceptable T value
+		return t[np.argmax(unacceptable)]
 	# All T values are acceptable
 	return t[-1]
 
@@ -356,6 +436,28 @@ def _sim_heat_args(arr, start_t, max_t, rounded=False):
 		last_t = end
 	return storage_heat, direct_heat
 
+def _sim_heat_arr(storage_heat, direct_heat, start_t, n):
+	"""
+	Map heat arguments for Building.simulate_heat() to a sequence of floats.
+
+	This is the inverse of _sim_heat_args() (up to rounding), returning an
+	array of length 5*n. Any heating periods beyond the first n are discarded,
+	while if there are fewer than n the remainder are zero.
+	"""
+	arr = np.zeros(5 * n)
+	last_t = start_t
+	for i, (start, end) in enumerate(storage_heat[:n]):
+		arr[2*i] = start - last_t
+		arr[2*i + 1] = end - start
+		last_t = end
+	last_t = start_t
+	for i, (start, end, power) in enumerate(direct_heat[:n]):
+		arr[2*n + 3*i] = start - last_t
+		arr[2*n + 3*i + 1] = end - start
+		arr[2*n + 3*i + 2] = power
+		last_t = end
+	return arr
+
 
 def useful_heat_energy(building, temp_ranges, init_vals, other_heat,
                        outdoor_temps, end_t):
@@ -390,6 +492,53 @@ def useful_heat_energy(building, temp_ranges, init_vals, other_heat,
 	  end_t             The t value until which acceptable temperatures
 	                    should be maintained.
 	"""
+	return sum(_useful_heat_usage(
+		building, temp_ranges, init_vals, other_heat, outdoor_temps, end_t
+	))
+
+def useful_heat_energies(building, temp_ranges, init_vals, other_heat,
+                         outdoor_temps, end_ts):
+	"""
+	Return the useful_heat_energy() for each of several end_t values.
+
+	Arguments are as for useful_heat_energy(), except that end_ts is a
+	sequence of end_t values. Returns a list of the corresponding energies.
+
+	Since the simulation up to any time is unaffected by what happens
+	thereafter, all end_ts which are a whole number of hours after
+	init_vals[0] are dealt with by a single simulation, with the energy used
+	until each then read off from the half-hourly usage. Any others require
+	their own simulation (since useful_heat_energy() only simulates up to the
+	last whole hour for which there is an outdoor temperature, so may not
+	include the usage in the half hour immediately before end_t).
+	"""
+	start_t = init_vals[0]
+	energies = [None] * len(end_ts)
+	aligned_idxs = [
+		i for i, end_t in enumerate(end_ts)
+		if float(end_t - start_t).is_integer()
+	]
+	if len(aligned_idxs) > 0:
+		usage = _useful_heat_usage(
+			building, temp_ranges, init_vals, other_heat, outdoor_temps,
+			max(end_ts[i] for i in aligned_idxs)
+		)
+		cumulative_usage = np.concatenate(([0], np.cumsum(usage)))
+		for i in aligned_idxs:
+			energies[i] = cumulative_usage[int(2 * (end_ts[i] - start_t))]
+	for i, end_t in enumerate(end_ts):
+		if energies[i] is None:
+			energies[i] = useful_heat_energy(
+				building, temp_ranges, init_vals, other_heat, outdoor_temps, end_t
+			)
+	return energies
+
+def _useful_heat_usage(building, temp_ranges, init_vals, other_heat,
+                       outdoor_temps, end_t):
+	"""
+	Helper function for useful_heat_energy(); return the half-hourly energy
+	usage of the "perfect heating system".
+	"""
 	start_t = init_vals[0]
 	if len(init_vals) == 2:
 		init_vals = (start_t, init_vals[1], init_vals[1], init_vals[1])
@@ -405,4 +554,4 @@ def useful_heat_energy(building, temp_ranges, init_vals, other_heat,
 	t, T,Q,S, usage = building.simulate_heat(
 		init_vals, [], "thermostat", other_heat, outdoor_temps, temp_ranges
 	)
-	return sum(usage)
+	return usage
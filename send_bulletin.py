@@ -14,7 +14,7 @@ import io
 import zoneinfo
 
 import numpy as np
-import matplotlib.pyplot as plt
+import matplotlib.figure
 
 import config
 import misc
@@ -33,18 +33,22 @@ def prices_list(prices):
 
 	prices should be the list returned by data.get_agile_prices().
 	"""
-	output_str = ""
 	start_time = misc.midnight_tonight(local=True) - datetime.timedelta(hours=1)
-	for price, time in zip(prices, misc.datetime_sequence(start_time, 0.5)):
+	# Calculate the lengths of all of the bars at once
+	abs_prices = np.abs(np.asarray(prices, dtype=float))
+	bar_lengths = 1 + (20*np.log(1 + 0.1*abs_prices)).astype(int)
+	lines = []
+	for price, bar_length, time in zip(
+		prices, bar_lengths.tolist(), misc.datetime_sequence(start_time, 0.5)
+	):
 		if price == 0:
 			graphical_price = ""
 		elif price >= 0:
-			graphical_price = '+'*(1 + int(20*np.log(1+0.1*price)))
+			graphical_price = '+'*bar_length
 		else:
-			graphical_price = '-'*(1 + int(20*np.log(1-0.1*price)))
-		output_str += f"{time.strftime('%H:%M')}    "
-		output_str += f"{price:>5.2f}    {graphical_price}\n"
-	return output_str
+			graphical_price = '-'*bar_length
+		lines.append(f"{time.strftime('%H:%M')}    {price:>5.2f}    {graphical_price}\n")
+	return "".join(lines)
 
 def consumption_paragraph():
 	"""
@@ -108,11 +112,11 @@ def cheapest_window_paragraph(prices):
 	at 23:00 tonight.
 	"""
 	prices_start = misc.midnight_tonight(True) - datetime.timedelta(hours=1)
+	prices_dict = dict(zip(misc.datetime_sequence(prices_start, 0.5), prices))
 	paragraph = ""
 	for window_length in (.5, 1, 1.5, 2, 2.5, 3, 4, 6):
 		start, avg_price = price_optimisation.cheapest_window(
-			window_length,
-			{t:p for t,p in zip(misc.datetime_sequence(prices_start, 0.5), prices)}
+			window_length, prices_dict
 		)
 		if start is not None:
 			paragraph += (
@@ -135,13 +139,15 @@ def plot_prices(agile_prices, price_forecast=None, tom_min_max=False, format="pn
 	Horizontal lines showing the minimum and maximum of tomorrow's prices are
 	shown if tom_min_max is True.
 
-	format is passed as a keyword argument to the matplotlib.pyplot.Figure.savefig()
+	format is passed as a keyword argument to the matplotlib.figure.Figure.savefig()
 	method.
 	"""
 	one_hour = datetime.timedelta(hours=1)
 	zero_hour = misc.midnight_tonight()
-	# Create the figure
-	fig = plt.figure()
+	# Create the figure (directly rather than via pyplot, which would keep a
+	# reference to every figure and initialise an interactive backend, neither
+	# of which is needed when only rendering to a file)
+	fig = matplotlib.figure.Figure()
 	ax = fig.add_subplot()
 	ax.set_xlabel("Time")
 	ax.set_ylabel("Price (p / kWh)")
@@ -151,13 +157,10 @@ def plot_prices(agile_prices, price_forecast=None, tom_min_max=False, format="pn
 	ax.set_xticks(np.linspace(-1, 200, 202), minor=True)
 	ax.set_yticks(np.linspace(-100, 100, 41))
 	# Plot tomorrow's prices with constant values apart from a discontinuous
-	# jump at the boundaries between settlement periods
-	times_in_hrs = np.array([n/2 - 1 for n in range(len(agile_prices))])
-	times = [zero_hour + x * one_hour for x in times_in_hrs]
-	ax.plot(
-		np.array(list(zip(times_in_hrs, times_in_hrs + 0.5))).flatten(),
-		np.repeat(agile_prices, 2),
-		"k-"
+	# jump at the boundaries between settlement periods (as a step plot)
+	times_in_hrs = np.arange(len(agile_prices)) / 2 - 1
+	ax.step(
+		*_settlement_period_steps(times_in_hrs, agile_prices), "k-", where="post"
 	)
 	# Plot the forecast
 	if price_forecast is None:
@@ -181,10 +184,12 @@ def plot_prices(agile_prices, price_forecast=None, tom_min_max=False, format="pn
 		times_in_hrs = np.array([
 			(t-zero_hour) / one_hour for t in times
 		])
-		ax.plot(
-			np.array(list(zip(times_in_hrs, times_in_hrs + 0.5))).flatten(),
-			np.repeat([price_forecast[t] for t in times], 2),
-			"b--"
+		ax.step(
+			*_settlement_period_steps(
+				times_in_hrs, [price_forecast[t] for t in times]
+			),
+			"b--",
+			where="post"
 		)
 		# Adjust width to 8 days
 		fig.set_size_inches(15, 4.8)
@@ -199,19 +204,16 @@ def plot_prices(agile_prices, price_forecast=None, tom_min_max=False, format="pn
 			max(max(agile_prices), max(price_forecast.values())) + 2
 		])
 	# Handle xticks (such that they occur at the same clock hours even when
-	# there's a daylight savings switchover)
+	# there's a daylight savings switchover). The sequence steps in real time,
+	# so the nth local time is n hours after zero_hour.
 	local_zero_hour = zero_hour.astimezone(zoneinfo.ZoneInfo(config.TIME_ZONE))
-	x_tick_times = [
-		t for t in misc.datetime_sequence(local_zero_hour, 1, max_x+1)
+	x_ticks = [
+		(n, t)
+		for n, t in enumerate(misc.datetime_sequence(local_zero_hour, 1, max_x+1))
 		if t.hour % x_tick_interval == 0
 	]
-	x_tick_hrs = [
-		(t.astimezone(datetime.timezone.utc) - zero_hour) / one_hour
-		for t in x_tick_times
-	]
-	x_tick_labels = [
-		t.strftime(x_tick_format) for t in x_tick_times
-	]
+	x_tick_hrs = [n for n, _ in x_ticks]
+	x_tick_labels = [t.strftime(x_tick_format) for _, t in x_ticks]
 	if price_forecast is not None:
 		# Omit last label when plotting 8 days
 		x_tick_labels[-1] = ""
@@ -229,6 +231,20 @@ def plot_prices(agile_prices, price_forecast=None, tom_min_max=False, format="pn
 		file_bytes = buf.getvalue()
 	return file_bytes
 
+def _settlement_period_steps(times_in_hrs, prices):
+	"""
+	Helper function for plot_prices(); return the x and y arrays with which
+	to plot prices as constant over each settlement period using
+	Axes.step(..., where="post").
+
+	The last price is repeated at the end of its settlement period (half an
+	hour after the last of times_in_hrs), so that it is drawn as a full step.
+	"""
+	xs = np.append(times_in_hrs, times_in_hrs[-1] + 0.5)
+	ys = np.append(prices, prices[-1]).astype(float)
+	return xs, ys
+
+
 
 def send_email(subj, body, attachments={}):
 	"""
@@ -269,10 +285,7 @@ def main():
 	Construct and send the email bulletin
 	"""
 	# Obtain the raw data from the relevant APIs
-	data.update_agile_prices() # This goes first because it may take a while
-	data.update_temperature_forecast()
-	data.update_nat_grid_demand_forecast()
-	data.update_nat_grid_wind_forecast()
+	data.update_all()
 	agile_prices = data.get_agile_prices()
 	price_forecast = price_forecasting.gen_price_forecast()
 
@@ -8,8 +8,9 @@ import urllib.request
 import io
 import contextlib
 
+import numpy as np
+
 import data
-import misc
 
 
 CONFIG_PATCH = unittest.mock.patch.multiple(
@@ -31,16 +32,49 @@ CONFIG_PATCH = unittest.mock.patch.multiple(
 )
 
 
+class TestUpdateAll(unittest.TestCase):
+	def test_update_all(self):
+		mocks = {
+			name : unittest.mock.Mock()
+			for name in [
+				"update_agile_prices",
+				"update_temperature_forecast",
+				"update_nat_grid_demand_forecast",
+				"update_nat_grid_wind_forecast",
+			]
+		}
+		with unittest.mock.patch.multiple(data, **mocks):
+			data.update_all(wait=False)
+		mocks["update_agile_prices"].assert_called_once_with(False)
+		mocks["update_temperature_forecast"].assert_called_once_with()
+		mocks["update_nat_grid_demand_forecast"].assert_called_once_with()
+		mocks["update_nat_grid_wind_forecast"].assert_called_once_with()
+
+	def test_exception(self):
+		mock_update_wind = unittest.mock.Mock(side_effect=RuntimeError)
+		mock_update_temps = unittest.mock.Mock()
+		with unittest.mock.patch.multiple(
+			data,
+			update_agile_prices=unittest.mock.Mock(),
+			update_temperature_forecast=mock_update_temps,
+			update_nat_grid_demand_forecast=unittest.mock.Mock(),
+			update_nat_grid_wind_forecast=mock_update_wind,
+		):
+			with self.assertRaises(RuntimeError):
+				data.update_all()
+		mock_update_temps.assert_called_once_with()
+
+
 class TestGetTemperatures(unittest.TestCase):
 	def test_get_hourly_temperatures(self):
 		utc = datetime.timezone.utc
 		start_time = datetime.datetime(2020,1,1,tzinfo=utc)
-		mock_load_csv_ts = unittest.mock.Mock(return_value={
-			k:str(v)
-			for k,v in zip(misc.datetime_sequence(start_time, 1), range(48))
-		})
+		mock_load_csv_ts = unittest.mock.Mock(return_value=(
+			np.arange(48) * 3600 + int(start_time.timestamp()),
+			np.arange(48, dtype=float)
+		))
 		csv_time_series_patch = unittest.mock.patch(
-			"data.load_csv_time_series",
+			"data.load_csv_time_series_arrays",
 			mock_load_csv_ts
 		)
 		with CONFIG_PATCH, csv_time_series_patch:
@@ -316,8 +350,17 @@ class TestUpdateTemperatures(unittest.TestCase):
 		mock_response_2 = unittest.mock.mock_open(
 			read_data=METOFF_3_HOURLY_TEMP_API_RESPONSE
 		)
+		# (the requests may be made in either order, so respond based on URL)
+		responses = {
+			"https://data.hub.api.metoffice.gov.uk/sitespecific/"
+			"v0/point/hourly?includeLocationName=true&"
+			"latitude=LATITUDE&longitude=LONGITUDE" : mock_response_1(),
+			"https://data.hub.api.metoffice.gov.uk/sitespecific/"
+			"v0/point/three-hourly?includeLocationName=true&"
+			"latitude=LATITUDE&longitude=LONGITUDE" : mock_response_2(),
+		}
 		self.mock_urlopen = unittest.mock.Mock(
-			side_effect=[mock_response_1(), mock_response_2()]
+			side_effect=lambda req: responses[req.get_full_url()]
 		)
 		self.urlopen_patch = unittest.mock.patch(
 			"data.urllib.request.urlopen",
@@ -334,35 +377,20 @@ class TestUpdateTemperatures(unittest.TestCase):
 			data.update_temperature_forecast()
 		# Check urlopen() calls
 		self.assertEqual(len(self.mock_urlopen.call_args_list), 2)
-		self.assertEqual(len(self.mock_urlopen.call_args_list[0].args), 1)
-		self.assertIs(
-			type(self.mock_urlopen.call_args_list[0].args[0]),
-			urllib.request.Request
-		)
+		for call in self.mock_urlopen.call_args_list:
+			self.assertEqual(len(call.args), 1)
+			self.assertIs(type(call.args[0]), urllib.request.Request)
+			self.assertEqual(call.args[0].get_header("Apikey"), "METOFF_API_KEY")
 		self.assertEqual(
-			self.mock_urlopen.call_args_list[0].args[0].get_full_url(),
-			"https://data.hub.api.metoffice.gov.uk/sitespecific/"
-			"v0/point/hourly?includeLocationName=true&"
-			"latitude=LATITUDE&longitude=LONGITUDE"
-		)
-		self.assertEqual(
-			self.mock_urlopen.call_args_list[0].args[0].get_header("Apikey"),
-			"METOFF_API_KEY"
-		)
-		self.assertEqual(len(self.mock_urlopen.call_args_list[1].args), 1)
-		self.assertIs(
-			type(self.mock_urlopen.call_args_list[1].args[0]),
-			urllib.request.Request
-		)
-		self.assertEqual(
-			self.mock_urlopen.call_args_list[1].args[0].get_full_url(),
-			"https://data.hub.api.metoffice.gov.uk/sitespecific/"
-			"v0/point/three-hourly?includeLocationName=true&"
-			"latitude=LATITUDE&longitude=LONGITUDE"
-		)
-		self.assertEqual(
-			self.mock_urlopen.call_args_list[1].args[0].get_header("Apikey"),
-			"METOFF_API_KEY"
+			sorted(c.args[0].get_full_url() for c in self.mock_urlopen.call_args_list),
+			[
+				"https://data.hub.api.metoffice.gov.uk/sitespecific/"
+				"v0/point/hourly?includeLocationName=true&"
+				"latitude=LATITUDE&longitude=LONGITUDE",
+				"https://data.hub.api.metoffice.gov.uk/sitespecific/"
+				"v0/point/three-hourly?includeLocationName=true&"
+				"latitude=LATITUDE&longitude=LONGITUDE",
+			]
 		)
 		# Check append_csv() call
 		self.mock_append_csv.assert_called_once()
@@ -523,16 +551,16 @@ class TestGetPrices(unittest.TestCase):
 			"data.misc.midnight_tonight",
 			mock_midnight_tonight
 		)
-		mock_load_csv_ts = unittest.mock.Mock(return_value={
-			k:str(v)
-			for k,v in zip(misc.datetime_sequence(start_time, .5), range(48))
-		})
+		mock_load_csv_ts = unittest.mock.Mock(return_value=(
+			np.arange(-48, 48) * 1800 + int(start_time.timestamp()),
+			np.arange(-48, 48, dtype=float)
+		))
 		csv_time_series_patch = unittest.mock.patch(
-			"data.load_csv_time_series",
+			"data.load_csv_time_series_arrays",
 			mock_load_csv_ts
 		)
 		with CONFIG_PATCH, time_patch, csv_time_series_patch:
-			self.assertEqual(data.get_agile_prices(), list(range(48)))
+			self.assertEqual(data.get_agile_prices(), list(range(-2, 48)))
 			mock_load_csv_ts.assert_called_once_with(
 				os.path.normpath("dir/price_filename"),
 				"Start Time", "Price (p/kWh)", r"%Y-%m-%dT%H:%M:%S"
@@ -770,10 +798,15 @@ class TestGetSpend(unittest.TestCase):
 		mock_response_4 = unittest.mock.mock_open(
 			read_data=OCTOPUS_PRICES_API_RESPONSE_2
 		)
-		self.mock_urlopen = unittest.mock.Mock(side_effect=[
-			mock_response_1(), mock_response_2(),
-			mock_response_3(), mock_response_4()
-		])
+		# (consumption and prices are fetched concurrently, so the order of
+		# calls is only fixed within each; consumption requests are the ones
+		# which need authentication)
+		consumption_responses = iter([mock_response_1(), mock_response_2()])
+		price_responses = iter([mock_response_3(), mock_response_4()])
+		self.mock_urlopen = unittest.mock.Mock(side_effect=lambda req: next(
+			consumption_responses if isinstance(req, urllib.request.Request)
+			else price_responses
+		))
 		self.urlopen_patch = unittest.mock.patch(
 			"data.urllib.request.urlopen",
 			self.mock_urlopen
@@ -792,7 +825,17 @@ class TestGetSpend(unittest.TestCase):
 		self.assertAlmostEqual(cost, 55.44)
 		# Check urlopen() calls
 		self.assertEqual(len(self.mock_urlopen.call_args_list), 4)
-		call_0_args = self.mock_urlopen.call_args_list[0].args
+		consumption_calls = [
+			c for c in self.mock_urlopen.call_args_list
+			if isinstance(c.args[0], urllib.request.Request)
+		]
+		price_calls = [
+			c for c in self.mock_urlopen.call_args_list
+			if not isinstance(c.args[0], urllib.request.Request)
+		]
+		self.assertEqual(len(consumption_calls), 2)
+		self.assertEqual(len(price_calls), 2)
+		call_0_args = consumption_calls[0].args
 		self.assertEqual(len(call_0_args), 1)
 		self.assertIs(
 			type(call_0_args[0]),
@@ -809,7 +852,7 @@ class TestGetSpend(unittest.TestCase):
 			call_0_args[0].get_header("Authorization"),
 			"Basic T0NUT1BVU19BUElfS0VZOg=="
 		)
-		call_1_args = self.mock_urlopen.call_args_list[1].args
+		call_1_args = consumption_calls[1].args
 		self.assertEqual(len(call_1_args), 1)
 		self.assertIs(
 			type(call_1_args[0]),
@@ -824,7 +867,7 @@ class TestGetSpend(unittest.TestCase):
 			"Basic T0NUT1BVU19BUElfS0VZOg=="
 		)
 		self.assertEqual(
-			self.mock_urlopen.call_args_list[2].args,
+			price_calls[0].args,
 			(
 				"https://api.octopus.energy/v1/products/"
 				"AGILE-FLEX-22-11-25/electricity-tariffs/"
@@ -834,11 +877,89 @@ class TestGetSpend(unittest.TestCase):
 			)
 		)
 		self.assertEqual(
-			self.mock_urlopen.call_args_list[3].args,
+			price_calls[1].args,
 			("https://example.com/next_page",)
 		)
 
 
+	def test_unaligned_start(self):
+		# start should be rounded down to the start of its settlement period
+		local_tz = zoneinfo.ZoneInfo("Europe/London")
+		start = datetime.datetime(2020, 6, 1, 8, 10, 30, tzinfo=local_tz)
+		end = datetime.datetime(2020, 6, 1, 12, 30, tzinfo=local_tz)
+		with CONFIG_PATCH, self.urlopen_patch:
+			data.get_actual_spend(start, end)
+		urls = sorted(
+			c.args[0].get_full_url() if isinstance(c.args[0], urllib.request.Request)
+			else c.args[0]
+			for c in self.mock_urlopen.call_args_list
+		)
+		self.assertEqual(
+			urls[:2],
+			[
+				"https://api.octopus.energy/v1/electricity-meter-points/"
+				"OCTOPUS_MPAN/meters/OCTOPUS_METER_SERIAL_NO/consumption/"
+				"?page_size=1500&period_from=2020-06-01T07:00Z"
+				"&period_to=2020-06-01T11:00Z",
+				"https://api.octopus.energy/v1/products/"
+				"AGILE-FLEX-22-11-25/electricity-tariffs/"
+				"E-1R-AGILE-FLEX-22-11-25-A/standard-unit-rates"
+				"?page_size=1500&period_from=2020-06-01T07:00Z"
+				"&period_to=2020-06-01T11:30Z",
+			]
+		)
+
+	def test_rounding(self):
+		# Values should be rounded as by the builtin round() (as Octopus does)
+		consumption_patch = unittest.mock.patch(
+			"data._get_octopus_consumption",
+			unittest.mock.Mock(return_value={0: 0.005, 1800: 1.819, 3600: 1})
+		)
+		prices_patch = unittest.mock.patch(
+			"data._get_octopus_prices",
+			unittest.mock.Mock(return_value={0: 20, 1800: 39.225, 3600: 2.675})
+		)
+		start = datetime.datetime(2020, 6, 1, 8, tzinfo=datetime.timezone.utc)
+		end = datetime.datetime(2020, 6, 1, 9, 30, tzinfo=datetime.timezone.utc)
+		with CONFIG_PATCH, consumption_patch, prices_patch:
+			energy, cost = data.get_actual_spend(start, end)
+		self.assertAlmostEqual(energy, 2.824)
+		self.assertAlmostEqual(cost, 1.05 * (0.2 + 71.40 + 2.67))
+
+
+class TestGetAllPages(unittest.TestCase):
+	def test_concurrent_pages(self):
+		url = "https://example.com/results/?page_size=2&period_from=2020-06-01T07:00Z"
+		pages = {
+			url : {
+				"count": 5,
+				"next": url.replace("?", "?page=2&"),
+				"results": [1, 2]
+			},
+			url.replace("?", "?page=2&") : {
+				"count": 5,
+				"next": url.replace("?", "?page=3&"),
+				"results": [3, 4]
+			},
+			url.replace("?", "?page=3&") : {
+				"count": 5,
+				"next": None,
+				"results": [5]
+			},
+		}
+		mock_get_json = unittest.mock.Mock(side_effect=(
+			lambda req: pages[req.full_url]
+		))
+		with unittest.mock.patch("data._get_json", mock_get_json):
+			self.assertEqual(
+				list(data._get_all_pages(url, {"header": "value"})),
+				[[1, 2], [3, 4], [5]]
+			)
+		self.assertEqual(len(mock_get_json.call_args_list), 3)
+		for c in mock_get_json.call_args_list:
+			self.assertEqual(c.args[0].headers, {"Header": "value"})
+
+
 EXAMPLE_CSV = (
 	"Header_1,Header_2,Header_3,Header_4\r\n"
 	"2020-01-01T00:00:00,1,2,3\r\n"
@@ -858,6 +979,10 @@ class TestAppendCSV(unittest.TestCase):
 			contextlib.nullcontext(self.mock_writer)
 		])
 		self.open_patch = unittest.mock.patch("builtins.open", self.mock_open)
+		self.mock_replace = unittest.mock.Mock()
+		replace_patch = unittest.mock.patch("data.os.replace", self.mock_replace)
+		replace_patch.start()
+		self.addCleanup(replace_patch.stop)
 		self.new_rows_arg = [
 			["2020-01-01T01:30:00",13,14,{15}],
 			["2020-01-01T02:30:00",16,17,{18}],
@@ -878,8 +1003,9 @@ class TestAppendCSV(unittest.TestCase):
 		)
 		self.assertEqual(
 			self.mock_open.call_args_list[1],
-			unittest.mock.call("file_path", "w", newline="", encoding="utf-8")
+			unittest.mock.call("file_path.tmp", "w", newline="", encoding="utf-8")
 		)
+		self.mock_replace.assert_called_once_with("file_path.tmp", "file_path")
 		self.assertEqual(
 			self.mock_writer.getvalue(),
 			"Header_1,Header_2,Header_3,Header_4,Header_5\r\n"
@@ -908,8 +1034,9 @@ class TestAppendCSV(unittest.TestCase):
 		)
 		self.assertEqual(
 			self.mock_open.call_args_list[1],
-			unittest.mock.call("file_path", "w", newline="", encoding="utf-8")
+			unittest.mock.call("file_path.tmp", "w", newline="", encoding="utf-8")
 		)
+		self.mock_replace.assert_called_once_with("file_path.tmp", "file_path")
 		self.assertEqual(
 			self.mock_writer.getvalue(),
 			"Header_1,Header_2,Header_3,Header_4,Header_5\r\n"
@@ -938,8 +1065,9 @@ class TestAppendCSV(unittest.TestCase):
 		)
 		self.assertEqual(
 			self.mock_open.call_args_list[1],
-			unittest.mock.call("file_path", "w", newline="", encoding="utf-8")
+			unittest.mock.call("file_path.tmp", "w", newline="", encoding="utf-8")
 		)
+		self.mock_replace.assert_called_once_with("file_path.tmp", "file_path")
 		self.assertEqual(
 			self.mock_writer.getvalue(),
 			"Header_1,Header_2,Header_3,Header_4,Header_5\r\n"
@@ -952,6 +1080,66 @@ class TestAppendCSV(unittest.TestCase):
 			"2020-01-01T02:00:00,19,,20,{21}\r\n"
 		)
 
+	def test_append_only(self):
+		# When no existing rows need changing, the file should only be
+		# appended to rather than rewritten
+		mock_writer = io.StringIO()
+		mock_open = unittest.mock.Mock(side_effect=[
+			contextlib.nullcontext(self.mock_reader),
+			contextlib.nullcontext(mock_writer)
+		])
+		open_patch = unittest.mock.patch("builtins.open", mock_open)
+		with open_patch:
+			data.append_csv(
+				"file_path",
+				[
+					["2020-01-01T01:30:00",13,14,15],
+					["2020-01-01T02:00:00",16,17,18],
+				],
+				["Header_1", "Header_2", "Header_3", "Header_4"],
+				"Header_1"
+			)
+		self.assertEqual(len(mock_open.call_args_list), 2)
+		self.assertEqual(
+			mock_open.call_args_list[1],
+			unittest.mock.call("file_path", "a", newline="", encoding="utf-8")
+		)
+		self.mock_replace.assert_not_called()
+		self.assertEqual(
+			mock_writer.getvalue(),
+			"2020-01-01T02:00:00,16,17,18\r\n"
+		)
+
+	def test_new_column_no_rows(self):
+		# New columns should be added to the header even if the file has no
+		# other rows
+		mock_writer = io.StringIO()
+		mock_open = unittest.mock.Mock(side_effect=[
+			contextlib.nullcontext(io.StringIO("Time,A\r\n")),
+			contextlib.nullcontext(mock_writer)
+		])
+		with unittest.mock.patch("builtins.open", mock_open):
+			data.append_csv("file_path", [("t1", "1")], ["Time", "B"], "Time")
+		self.assertEqual(
+			mock_open.call_args_list[1],
+			unittest.mock.call("file_path.tmp", "w", newline="", encoding="utf-8")
+		)
+		self.assertEqual(mock_writer.getvalue(), "Time,A,B\r\nt1,,1\r\n")
+
+	def test_no_trailing_line_break(self):
+		# Rows shouldn't be appended onto the end of an incomplete last line
+		mock_writer = io.StringIO()
+		mock_open = unittest.mock.Mock(side_effect=[
+			contextlib.nullcontext(io.StringIO("Time,A\r\nt0,5")),
+			contextlib.nullcontext(mock_writer)
+		])
+		with unittest.mock.patch("builtins.open", mock_open):
+			data.append_csv("file_path", [("t1", "1")], ["Time", "A"], "Time")
+		self.assertEqual(
+			mock_writer.getvalue(), "Time,A\r\nt0,5\r\nt1,1\r\n"
+		)
+		self.mock_replace.assert_called_once_with("file_path.tmp", "file_path")
+
 	def test_file_not_found(self):
 		mock_writer = io.StringIO()
 		mock_open = unittest.mock.Mock(side_effect=[
@@ -972,8 +1160,9 @@ class TestAppendCSV(unittest.TestCase):
 		)
 		self.assertEqual(
 			mock_open.call_args_list[1],
-			unittest.mock.call("file_path", "w", newline="", encoding="utf-8")
+			unittest.mock.call("file_path.tmp", "w", newline="", encoding="utf-8")
 		)
+		self.mock_replace.assert_called_once_with("file_path.tmp", "file_path")
 		self.assertEqual(
 			mock_writer.getvalue(),
 			"Header_1,Header_2,Header_4,Header_5\r\n"
@@ -1006,3 +1195,113 @@ class TestCSVTimeSeries(unittest.TestCase):
 		mock_open.assert_called_once_with(
 			"file_path", "r", newline="", encoding="utf-8"
 		)
+
+	def test_non_iso_time_format(self):
+		utc = datetime.timezone.utc
+		mock_open = unittest.mock.mock_open(read_data=(
+			"Time,Value\r\n"
+			"01/01/2020 00:30,1.5\r\n"
+			"01/01/2020 00:00,2.5\r\n"
+		))
+		open_patch = unittest.mock.patch("builtins.open", mock_open)
+		with open_patch:
+			self.assertEqual(
+				data.load_csv_time_series(
+					"file_path",
+					"Time",
+					"Value",
+					r"%d/%m/%Y %H:%M"
+				),
+				{
+					datetime.datetime(2020,1,1,0,30,tzinfo=utc): "1.5",
+					datetime.datetime(2020,1,1,0, 0,tzinfo=utc): "2.5",
+				}
+			)
+
+	def test_malformed_times(self):
+		# Times which don't exactly match the format should be rejected (as
+		# by strptime()), even if numpy could parse them
+		for time_str in (
+			"2020-01-01 00:30:00", "2020-01-01", "2020-01-01T00:30:00.5"
+		):
+			mock_open = unittest.mock.mock_open(read_data=(
+				"Time,Value\r\n"
+				"2020-01-01T00:00:00,2.5\r\n"
+				f"{time_str},1.5\r\n"
+			))
+			open_patch = unittest.mock.patch("builtins.open", mock_open)
+			with open_patch, self.assertRaises(ValueError):
+				data.load_csv_time_series(
+					"file_path", "Time", "Value", r"%Y-%m-%dT%H:%M:%S"
+				)
+
+
+class TestCSVTimeSeriesArrays(unittest.TestCase):
+
+	def setUp(self):
+		data._load_csv_time_series_arrays.cache_clear()
+		self.mock_stat = unittest.mock.Mock(
+			return_value=unittest.mock.Mock(st_mtime_ns=1, st_size=10, st_ino=100)
+		)
+		self.stat_patch = unittest.mock.patch("data.os.stat", self.mock_stat)
+
+	def tearDown(self):
+		data._load_csv_time_series_arrays.cache_clear()
+
+	def test_load_csv_time_series_arrays(self):
+		mock_open = unittest.mock.mock_open(read_data=(
+			"Time,Value\r\n"
+			"2020-01-01T01:00:00Z,3\r\n"
+			"2020-01-01T00:00:00Z,1\r\n"
+			"2020-01-01T00:30:00Z,2.5\r\n"
+			"2020-01-01T00:00:00Z,-1\r\n"
+		))
+		open_patch = unittest.mock.patch("builtins.open", mock_open)
+		with open_patch, self.stat_patch:
+			times, values = data.load_csv_time_series_arrays(
+				"file_path",
+				"Time",
+				"Value",
+			)
+		mock_open.assert_called_once_with(
+			"file_path", "r", newline="", encoding="utf-8"
+		)
+		self.assertEqual(times.dtype, np.int64)
+		self.assertEqual(values.dtype, np.float64)
+		self.assertEqual(
+			times.tolist(),
+			[1577836800, 1577838600, 1577840400]
+		)
+		self.assertEqual(values.tolist(), [-1, 2.5, 3])
+
+	def test_cache(self):
+		mock_open = unittest.mock.mock_open(read_data=(
+			"Time,Value\r\n"
+			"2020-01-01T00:00:00Z,1\r\n"
+		))
+		open_patch = unittest.mock.patch("builtins.open", mock_open)
+		with open_patch, self.stat_patch:
+			times, values = data.load_csv_time_series_arrays(
+				"file_path", "Time", "Value"
+			)
+			# Unmodified file should not be re-read
+			self.assertIs(
+				data.load_csv_time_series_arrays("file_path", "Time", "Value")[0],
+				times
+			)
+			mock_open.assert_called_once()
+			self.mock_stat.assert_called_with("file_path")
+			with self.assertRaises(ValueError):
+				values[0] = 2
+			# Modified file should be
+			self.mock_stat.return_value.st_mtime_ns = 2
+			data.load_csv_time_series_arrays("file_path", "Time", "Value")
+			self.assertEqual(mock_open.call_count, 2)
+			# Even if the modification time is unchanged (e.g. due to its
+			# limited resolution), as long as the size or inode differs
+			self.mock_stat.return_value.st_size = 20
+			data.load_csv_time_series_arrays("file_path", "Time", "Value")
+			self.assertEqual(mock_open.call_count, 3)
+			self.mock_stat.return_value.st_ino = 200
+			data.load_csv_time_series_arrays("file_path", "Time", "Value")
+			self.assertEqual(mock_open.call_count, 4)
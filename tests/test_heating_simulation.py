@@ -30,6 +30,15 @@ class TestDifferentialEqns(unittest.TestCase):
 		self.assertAlmostEqual(soln[0], -1.612294065)
 		self.assertAlmostEqual(soln[1], 364777592.8, 1)
 
+	def test_simple_ODE_out(self):
+		for X in [3, 0]:
+			out = np.empty(2)
+			soln = heating_simulation.solve_simple_ODE(1, 2, X, 4, 5, [0, 7], out)
+			self.assertIs(soln, out)
+			self.assertTrue(np.all(
+				out == heating_simulation.solve_simple_ODE(1, 2, X, 4, 5, [0, 7])
+			))
+
 	def test_simple_vector_ODE(self):
 		soln = heating_simulation.solve_simple_vector_ODE(
 			0,
@@ -321,6 +330,38 @@ class TestSimulation(unittest.TestCase):
 		self.assertEqual(sum(usage), 0)
 
 
+class TestContainingIntervals(unittest.TestCase):
+	def test_containing_intervals(self):
+		intervals = [(5, 7), (0, 2), (2, 3), (10, 20)]
+		self.assertEqual(
+			heating_simulation._containing_intervals(
+				intervals, [-1, 0, 1.9, 2, 3, 4, 5, 6.99, 7, 15, 20, 25]
+			),
+			# (starts are inclusive and ends exclusive, including for adjacent
+			# intervals)
+			[-1, 1, 1, 2, -1, -1, 0, 0, -1, 3, -1, -1]
+		)
+
+	def test_zero_length_intervals(self):
+		# Zero-length intervals shouldn't hide a longer one containing them
+		self.assertEqual(
+			heating_simulation._containing_intervals(
+				[(0, 10), (3, 3), (5, 4)], [3, 5, 10]
+			),
+			[0, 0, -1]
+		)
+		self.assertEqual(
+			heating_simulation._containing_intervals([(3, 3)], [2, 3, 4]),
+			[-1, -1, -1]
+		)
+
+	def test_no_intervals(self):
+		self.assertEqual(
+			heating_simulation._containing_intervals([], [0, 1, 2]),
+			[-1, -1, -1]
+		)
+
+
 class TestBuildingFromConfig(unittest.TestCase):
 
 	def test_from_config(self):
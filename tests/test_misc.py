@@ -94,3 +94,14 @@ class TestDatetimeSequences(unittest.TestCase):
 				"05/04/2003 at 07:07:08"
 			]
 		)
+
+	def test_default_datetime_str_format(self):
+		local_tz = zoneinfo.ZoneInfo("Europe/London")
+		start = datetime.datetime(2020, 10, 24, 23, 30, 15, tzinfo=local_tz)
+		self.assertEqual(
+			list(misc.datetime_str_sequence(start, 1.5, seq_length=4)),
+			[
+				dt.strftime(r"%Y-%m-%dT%H:%M:%SZ")
+				for dt in misc.datetime_sequence(start, 1.5, 4)
+			]
+		)
@@ -35,7 +35,7 @@ class TestHeatingOptions(unittest.TestCase):
 			lambda: mock_building
 		)
 		# Mock relevant price_optimisation functions
-		def mock_chpst_heat_se(*args):
+		def mock_chpst_heat_se(*args, **kwargs):
 			if args[7] == 26:
 				return (
 					[(0,1), (1,1)],                # storage_heat
@@ -56,20 +56,14 @@ class TestHeatingOptions(unittest.TestCase):
 					("t_2", "T_2", "Q_2", "S_2")
 				)
 		mock_cheapest_heat = unittest.mock.Mock(side_effect=mock_chpst_heat_se)
-		def mock_useful_heat_se(*args):
-			if args[5] == 26:
-				return .5
-			else:
-				self.assertEqual(args[5], 36)
-				return 1.5
-		mock_useful_heat = unittest.mock.Mock(side_effect=mock_useful_heat_se)
+		mock_useful_heat = unittest.mock.Mock(return_value=[.5, 1.5])
 		mock_temp_ranges_from_config = unittest.mock.Mock(
 			return_value=[(10,0,30), (-10,0,30), (-5,15,25)]
 		)
 		price_opt_patch = unittest.mock.patch.multiple(
 			plan_heating.price_optimisation,
 			cheapest_heat=mock_cheapest_heat,
-			useful_heat_energy=mock_useful_heat,
+			useful_heat_energies=mock_useful_heat,
 			temp_ranges_from_config=mock_temp_ranges_from_config,
 		)
 		# (note that temp_ranges should be sorted by time, and an initial
@@ -161,7 +155,8 @@ class TestHeatingOptions(unittest.TestCase):
 				"prices",
 				26,
 				2,
-				10
+				10,
+				init_heat=None
 			),
 			unittest.mock.call(
 				mock_building,
@@ -173,27 +168,19 @@ class TestHeatingOptions(unittest.TestCase):
 				"prices",
 				36,
 				2,
-				10
-			),
-		])
-		mock_useful_heat.assert_has_calls([
-			unittest.mock.call(
-				mock_building,
-				expected_temp_ranges,
-				(0, "start_indoor_temp"),
-				[(0, np.inf, 1/24)],
-				[10]*100,
-				26,
-			),
-			unittest.mock.call(
-				mock_building,
-				expected_temp_ranges,
-				(0, "start_indoor_temp"),
-				[(0, np.inf, 1/24)],
-				[10]*100,
-				36,
+				10,
+				# (seeded with the result for the previous end_t)
+				init_heat=([(0,1), (1,1)], [(3,3,1), (4,5,0), (6,7,2)])
 			),
 		])
+		mock_useful_heat.assert_called_once_with(
+			mock_building,
+			expected_temp_ranges,
+			(0, "start_indoor_temp"),
+			[(0, np.inf, 1/24)],
+			[10]*100,
+			[26, 36],
+		)
 		mock_temp_ranges_from_config.assert_called_once_with(
 			start_t.astimezone(utc), 0, 36
 		)
@@ -142,6 +142,15 @@ class TestGenPriceForecast(unittest.TestCase):
 			FORECAST_MODEL_FILE = "model_file",
 			TIME_ZONE = "Europe/London"
 		)
+		# Mock the model file's modification time (and make sure no model
+		# is cached from a previous test)
+		price_forecasting._load_model.cache_clear()
+		self.mock_stat = unittest.mock.Mock(
+			return_value=unittest.mock.Mock(st_mtime_ns=0, st_size=10, st_ino=100)
+		)
+		stat_patch = unittest.mock.patch("price_forecasting.os.stat", self.mock_stat)
+		stat_patch.start()
+		self.addCleanup(stat_patch.stop)
 		# Mock reading the csv files (6 days of wind and demand data, only
 		# 2 of prices)
 		def mock_csv_time_series(file_path, time_col, val_col, time_format):
@@ -175,17 +184,22 @@ class TestGenPriceForecast(unittest.TestCase):
 				}
 			else:
 				self.fail("incorrect csv path")
+		def mock_csv_time_series_arrays(*args):
+			time_series = mock_csv_time_series(*args)
+			return (
+				np.array([t.timestamp() for t in time_series], dtype=np.int64),
+				np.array(list(time_series.values()), dtype=np.float64)
+			)
 		self.data_patch = unittest.mock.patch(
-			"price_forecasting.data.load_csv_time_series",
-			mock_csv_time_series
+			"price_forecasting.data.load_csv_time_series_arrays",
+			mock_csv_time_series_arrays
 		)
 		# Mock loading the model (use a model which just passes demand
 		# values straight through, plus 1000 times the settlement period
 		# number)
-		mock_model = unittest.mock.Mock()
-		def mock_model_predict(inputs, *args, **kwargs):
+		def mock_model_call(inputs, *args, **kwargs):
 			return np.array(inputs[1])[:,:,0] + np.linspace(0, 47000, 48)
-		mock_model.predict = mock_model_predict
+		mock_model = unittest.mock.Mock(side_effect=mock_model_call)
 		def mock_load_model(path, **kwargs):
 			if os.path.normpath(path) != os.path.normpath("dir/model_file"):
 				# self.assertEqual() can't be used as it is swallowed by
@@ -264,6 +278,28 @@ class TestGenPriceForecast(unittest.TestCase):
 				)}
 			)
 
+	def test_model_cached(self):
+		utc = datetime.timezone.utc
+		self.start = datetime.datetime(2020, 1, 1, 23, tzinfo=utc)
+		with self.config_patch, self.data_patch, self.load_model_patch:
+			with unittest.mock.patch(
+				"price_forecasting.keras.models.load_model",
+				wraps=price_forecasting.keras.models.load_model
+			) as mock_load_model:
+				first_forecast = price_forecasting.gen_price_forecast()
+				self.assertEqual(
+					price_forecasting.gen_price_forecast(), first_forecast
+				)
+				mock_load_model.assert_called_once()
+				# The model should be reloaded if the file is modified
+				self.mock_stat.return_value.st_mtime_ns = 1
+				price_forecasting.gen_price_forecast()
+				self.assertEqual(mock_load_model.call_count, 2)
+				# Or replaced (even with the same modification time)
+				self.mock_stat.return_value.st_ino = 200
+				price_forecasting.gen_price_forecast()
+				self.assertEqual(mock_load_model.call_count, 3)
+
 	def test_no_model_found(self):
 		utc = datetime.timezone.utc
 		self.start = datetime.datetime(2020, 1, 1, 23, tzinfo=utc)
@@ -279,10 +315,7 @@ class TestGenPriceForecast(unittest.TestCase):
 	def test_model_error(self):
 		utc = datetime.timezone.utc
 		self.start = datetime.datetime(2020, 1, 1, 23, tzinfo=utc)
-		mock_model = unittest.mock.Mock()
-		def mock_model_predict(inputs, *args, **kwargs):
-			raise ValueError
-		mock_model.predict = mock_model_predict
+		mock_model = unittest.mock.Mock(side_effect=ValueError)
 		def mock_load_model(path, **kwargs):
 			return mock_model
 		load_model_patch = unittest.mock.patch(
@@ -45,6 +45,13 @@ class TestCheapestWindow(unittest.TestCase):
 		return_val = price_optimisation.cheapest_window(4.5, prices)
 		self.assertIsNone(return_val[0])
 		self.assertIsNone(return_val[1])
+		# (including when there are fewer prices than the window requires)
+		self.assertEqual(
+			price_optimisation.cheapest_window(
+				2, {t: prices[t] for t in list(prices)[:3]}
+			),
+			(None, None)
+		)
 
 
 class TestTempRangesFromConfig(unittest.TestCase):
@@ -133,15 +140,20 @@ class TestCheapestHeat(unittest.TestCase):
 		# _sim_heat_args() permits the exact solution)
 		def mock_cost_func(s, building, *args):
 			self.assertIs(building, self.building)
-			self.assertEqual(args, (
+			self.assertEqual(args[:4] + args[5:7], (
 				sorted(self.temp_ranges),
 				(100, 16, 16, 16),
 				self.other_heat,
 				self.outdoor_temps[:28],  # Truncated to end_t plus 30mins
-				self.prices,
 				126,
 				"penalty_per_heat_placeholder"
 			))
+			# (prices should have been converted to an array in advance)
+			self.assertIsInstance(args[4], np.ndarray)
+			self.assertEqual(list(args[4]), self.prices)
+			# (a unique ID should be provided for the optimisation's costs to
+			# be cached under)
+			self.assertIsInstance(args[7], int)
 			self.assertGreaterEqual(min(s), 0)
 			self.assertLessEqual(max(s[6], s[9]), 10)
 			if len(s) == 0:
@@ -171,6 +183,48 @@ class TestCheapestHeat(unittest.TestCase):
 			# This amount of heat should only just last until the next morning
 			self.assertAlmostEqual(act_end, 110.255, 2)
 
+	def test_process_pool_reused(self):
+		price_optimisation._process_pool.cache_clear()
+		self.addCleanup(price_optimisation._process_pool.cache_clear)
+		mock_pool = unittest.mock.Mock()
+		mock_pool_class = unittest.mock.Mock(return_value=mock_pool)
+		mock_de = unittest.mock.Mock(
+			return_value=unittest.mock.Mock(x=np.zeros(10))
+		)
+		threads_patch = unittest.mock.patch.object(
+			price_optimisation.config, "HEAT_OPTIMISATION_THREADS", 3
+		)
+		pool_patch = unittest.mock.patch(
+			"price_optimisation.multiprocessing.Pool", mock_pool_class
+		)
+		de_patch = unittest.mock.patch(
+			"price_optimisation.scipy.optimize.differential_evolution", mock_de
+		)
+		mock_atexit_register = unittest.mock.Mock()
+		atexit_patch = unittest.mock.patch(
+			"price_optimisation.atexit.register", mock_atexit_register
+		)
+		with self.config_patch, threads_patch, pool_patch, de_patch, atexit_patch:
+			for end_t in (110, 126):
+				price_optimisation.cheapest_heat(
+					self.building, self.temp_ranges, self.init_vals, 10,
+					self.other_heat, self.outdoor_temps, self.prices,
+					end_t, 2, 0
+				)
+		mock_pool_class.assert_called_once_with(3)
+		# (the pool should be closed at exit)
+		mock_atexit_register.assert_called_once_with(
+			price_optimisation._close_pool, mock_pool
+		)
+		self.assertEqual(mock_de.call_count, 2)
+		for call in mock_de.call_args_list:
+			self.assertEqual(call.kwargs["workers"], mock_pool.map)
+		# (each optimisation should have a different ID for caching costs)
+		self.assertNotEqual(
+			mock_de.call_args_list[0].kwargs["args"][-1],
+			mock_de.call_args_list[1].kwargs["args"][-1]
+		)
+
 	def test_0_num_heats(self):
 		def mock_cost_func(*args):
 			self.fail("_cheapest_heat_cost_func() should not be called")
@@ -254,6 +308,45 @@ class TestCostFunc(unittest.TestCase):
 			80 + 20
 		)
 
+	def test_cached(self):
+		self.sim_heat_return = (
+			[100, 105, 110, 115, 120, 125],
+			[ 20,  19,  18,  22,  21,  20],
+			[20]*6,
+			[20]*6,
+			[5, 0, 7, 0, 0, 0, 11]
+		)
+		args = (
+			self.mock_building,
+			[(0, 10, 30)],
+			(100, 20, 20, 20),
+			"other_heat",
+			"outdoor_temps",
+			[0, 1, 2, 3, 4, 5, 6, 7, 8],
+			120,
+			0,
+			next(price_optimisation._optimisation_ids)
+		)
+		# Values of s which round to the same heating shouldn't be re-simulated
+		for s in ((0, 1, 2, 3, 4), (0.01, 1.01, 2, 3, 4.1)):
+			self.assertEqual(
+				price_optimisation._cheapest_heat_cost_func(s, *args),
+				80
+			)
+		self.mock_building.simulate_heat.assert_called_once()
+		# But different heating should be
+		price_optimisation._cheapest_heat_cost_func((0, 2, 2, 3, 4), *args)
+		self.assertEqual(self.mock_building.simulate_heat.call_count, 2)
+		# As should any heating for a different optimisation
+		new_id = next(price_optimisation._optimisation_ids)
+		price_optimisation._cheapest_heat_cost_func(
+			(0, 1, 2, 3, 4), *args[:-1], new_id
+		)
+		self.assertEqual(self.mock_building.simulate_heat.call_count, 3)
+		# Or if there's no ID
+		price_optimisation._cheapest_heat_cost_func((0, 1, 2, 3, 4), *args[:-1])
+		self.assertEqual(self.mock_building.simulate_heat.call_count, 4)
+
 	def test_time_penalty(self):
 		self.sim_heat_return = (
 			[100, 105, 110, 115, 120, 125],
@@ -345,6 +438,37 @@ class TestCostFunc(unittest.TestCase):
 		self.mock_building.simulate_heat.assert_not_called()
 
 
+class TestFirstDeviation(unittest.TestCase):
+	def test_first_deviation_from_acceptable(self):
+		temp_ranges = [(100, 10, 20), (105, 15, 25), (110, 5, 30)]
+		# (the initial value is ignored)
+		self.assertEqual(
+			price_optimisation._first_deviation_from_acceptable(
+				[100, 100, 102, 105, 107, 110, 112,        115, 118],
+				[  0,  12,  12,  12,  16,  28,  30 + 1e-12, 31,  20],
+				temp_ranges
+			),
+			115
+		)
+		# The more permissive limits apply exactly at a changeover
+		self.assertEqual(
+			price_optimisation._first_deviation_from_acceptable(
+				[100, 102, 105, 105, 107],
+				[ 12,  12,  12,  24,  12],
+				temp_ranges
+			),
+			107
+		)
+		self.assertEqual(
+			price_optimisation._first_deviation_from_acceptable(
+				[100, 102, 107],
+				[ 12,  21,  16],
+				temp_ranges
+			),
+			102
+		)
+
+
 class TestEnergyCost(unittest.TestCase):
 	def test_energy_cost(self):
 		self.assertEqual(
@@ -363,6 +487,24 @@ class TestEnergyCost(unittest.TestCase):
 			price_optimisation._energy_cost([0,1,2,3,4,5], [1,2,3,5,7,11,0,1])
 
 
+class TestSimHeatArr(unittest.TestCase):
+	def test_sim_heat_arr(self):
+		arr = np.array([
+			.5, 1, 2, 0,              # storage heat
+			1, 2, 3.5, 0, 1.5, 1      # direct heat
+		])
+		storage_heat, direct_heat = price_optimisation._sim_heat_args(arr, 100, 200)
+		np.testing.assert_allclose(
+			price_optimisation._sim_heat_arr(storage_heat, direct_heat, 100, 2),
+			arr
+		)
+		# Excess heating periods should be discarded, and missing ones zero
+		np.testing.assert_allclose(
+			price_optimisation._sim_heat_arr(storage_heat, [], 100, 1),
+			[.5, 1, 0, 0, 0]
+		)
+
+
 class TestUsefulHeatEnergy(unittest.TestCase):
 
 	def test_useful_heat_energy(self):
@@ -395,6 +537,27 @@ class TestUsefulHeatEnergy(unittest.TestCase):
 			[(90,1,2), (100,3,4), (110,5,6), (120,7,8), (124,-np.inf,np.inf)]
 		)
 
+	def test_useful_heat_energies(self):
+		building = heating_simulation.Building(
+			.05, .1, .001, .0075, 1, .025, 4, 3, 100
+		)
+		temp_ranges = [(100,16,24), (105.25,5,30), (113,16,24), (130,5,30)]
+		outdoor_temps = list(10 * np.sin(np.arange(40) / 5))
+		# (a mixture of end_ts both on and off whole hours)
+		end_ts = [126, 110, 120.3, 120.5, 136]
+		energies = price_optimisation.useful_heat_energies(
+			building, temp_ranges, (100, 15), [(0, np.inf, .04)],
+			outdoor_temps, end_ts
+		)
+		for end_t, energy in zip(end_ts, energies):
+			self.assertAlmostEqual(
+				energy,
+				price_optimisation.useful_heat_energy(
+					building, temp_ranges, (100, 15), [(0, np.inf, .04)],
+					outdoor_temps, end_t
+				)
+			)
+
 	def test_insufficient_temperature_data(self):
 		with self.assertRaises(ValueError, msg="Insufficient temperature data"):
 			price_optimisation.useful_heat_energy(